@@ -0,0 +1,56 @@
+import fitz
+import cv2
+import numpy as np
+import os
+import hashlib
+
+CACHE_DIR = "extracted/.cache"
+
+def render_page(pdf_path, dpi=300):
+    """将PDF第一页渲染为BGR图像数组"""
+    doc = fitz.open(pdf_path)
+    page = doc[0]
+    zoom = dpi / 72
+    mat = fitz.Matrix(zoom, zoom)
+    pixmap = page.get_pixmap(matrix=mat)
+    img = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(pixmap.height, pixmap.width, pixmap.n)
+    if pixmap.n == 4:
+        img = img[:, :, :3]
+    img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+    doc.close()
+    return img
+
+def blur_gray(img, ksize=7, sigma=2):
+    """灰度化并做 ksize x ksize 高斯模糊，供多重平滑、实心平滑和黑色线条描摹共用"""
+    if len(img.shape) == 3:
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = img.copy()
+    
+    return cv2.GaussianBlur(gray, (ksize, ksize), sigma)
+
+def _prune_stale(path_key, version_prefix):
+    """删除同一PDF旧版本(mtime 不同)的缓存文件"""
+    for name in os.listdir(CACHE_DIR):
+        if name.startswith(f"{path_key}-") and not name.startswith(version_prefix):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError:
+                pass
+
+def get_page_array(pdf_path, dpi=300):
+    """读取渲染缓存，没有时渲染一次并保存为 .npy，之后以只读 mmap 方式加载"""
+    path_key = hashlib.sha1(os.path.abspath(pdf_path).encode("utf-8")).hexdigest()
+    version_prefix = f"{path_key}-{os.stat(pdf_path).st_mtime_ns}-"
+    dpi_key = hashlib.sha1(repr(dpi).encode("utf-8")).hexdigest()[:12]
+    cache_path = os.path.join(CACHE_DIR, f"{version_prefix}{dpi_key}.npy")
+    
+    if not os.path.exists(cache_path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, render_page(pdf_path, dpi))
+        os.replace(tmp_path, cache_path)
+        _prune_stale(path_key, version_prefix)
+    
+    return np.load(cache_path, mmap_mode="r")
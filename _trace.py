@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+FULL_KERNEL = np.ones((3, 3), np.uint8)
+NEIGHBOR_OFFSETS = [(dx, dy) for dy in (-1, 0, 1) for dx in (-1, 0, 1) if dx or dy]
+
+def _contour_runs(mask, seen):
+    """沿 findContours 顺序取出尚未访问的像素，并在跳变处切分为连续片段"""
+    contours, _ = cv2.findContours(mask, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
+    
+    runs = []
+    
+    for contour in contours:
+        pts = contour.reshape(-1, 2)
+        
+        _, first = np.unique(pts[:, 1] * mask.shape[1] + pts[:, 0], return_index=True)
+        pts = pts[np.sort(first)]
+        pts = pts[~seen[pts[:, 1], pts[:, 0]]]
+        seen[pts[:, 1], pts[:, 0]] = True
+        
+        if len(pts) == 0:
+            continue
+        
+        jumps = np.flatnonzero(np.abs(np.diff(pts, axis=0)).max(axis=1) > 1) + 1
+        pieces = np.split(pts, jumps)
+        if len(pieces) > 1 and np.abs(pieces[1][0] - pieces[0][0]).max() <= 1:
+            pieces = [np.concatenate((pieces[0][::-1], pieces[1]))] + pieces[2:]
+        
+        runs.extend(pieces)
+    
+    return runs
+
+def _join_adjacent(runs, max_partner_len=None):
+    """把端点八邻接的片段首尾相接，max_partner_len 限定只吸收不超过该长度的片段"""
+    ends = {}
+    for i, run in enumerate(runs):
+        ends.setdefault((int(run[0, 0]), int(run[0, 1])), []).append(i)
+        ends.setdefault((int(run[-1, 0]), int(run[-1, 1])), []).append(i)
+    
+    alive = [True] * len(runs)
+    
+    def partner(pt, base):
+        x, y = int(pt[0]), int(pt[1])
+        for dx, dy in [(0, 0)] + NEIGHBOR_OFFSETS:
+            for j in ends.get((x + dx, y + dy), ()):
+                if j != base and alive[j] and (max_partner_len is None or len(runs[j]) <= max_partner_len):
+                    return j
+        return None
+    
+    joined = []
+    for i, run in enumerate(runs):
+        if not alive[i] or (max_partner_len is not None and len(run) <= max_partner_len):
+            continue
+        alive[i] = False
+        
+        parts = [run]
+        while (j := partner(parts[-1][-1], i)) is not None:
+            alive[j] = False
+            other = runs[j]
+            near_head = np.abs(other[0] - parts[-1][-1]).max() <= 1
+            parts.append(other if near_head else other[::-1])
+        
+        while (j := partner(parts[0][0], i)) is not None:
+            alive[j] = False
+            other = runs[j]
+            near_tail = np.abs(other[-1] - parts[0][0]).max() <= 1
+            parts.insert(0, other if near_tail else other[::-1])
+        
+        joined.append(np.concatenate(parts) if len(parts) > 1 else run)
+    
+    joined.extend(run for i, run in enumerate(runs) if alive[i])
+    
+    return joined
+
+def trace_skeleton_paths(skeleton, min_length=1):
+    """将单像素骨架追踪为有序路径，保留全部骨架像素，返回点数不少于 min_length 的路径"""
+    skeleton = np.ascontiguousarray(skeleton, dtype=np.uint8)
+    seen = np.zeros(skeleton.shape, dtype=bool)
+    
+    runs = _contour_runs(skeleton, seen)
+    
+    neighbors = cv2.filter2D((skeleton > 0).astype(np.uint8), -1, FULL_KERNEL, borderType=cv2.BORDER_CONSTANT)
+    skipped = (skeleton > 0) & ~seen & (neighbors <= 6)
+    ys, xs = np.nonzero(skipped)
+    runs.extend(np.stack((xs, ys), axis=1).astype(np.int32)[:, None])
+    
+    runs = _join_adjacent(runs, max_partner_len=1)
+    runs = _join_adjacent(runs)
+    
+    return [run for run in runs if len(run) >= min_length]
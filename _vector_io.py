@@ -0,0 +1,25 @@
+def svg_path_elements(paths):
+    """逐条生成SVG <path> 元素，跳过少于两点的路径"""
+    for i, path in enumerate(paths):
+        if len(path) < 2:
+            continue
+        
+        points = path.reshape(-1, 2)
+        
+        body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+        yield f'    <path id="p{i}" d="M {points[0, 0]} {points[0, 1]} {body}"/>\n'
+
+def ai_path_blocks(paths, height):
+    """逐条生成AI描边路径，y 轴翻转为PostScript坐标"""
+    for i, path in enumerate(paths):
+        if len(path) < 2:
+            continue
+        
+        flipped = path.reshape(-1, 2).copy()
+        flipped[:, 1] = height - flipped[:, 1]
+        
+        body = ("%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist())
+        yield (f"\n% Path {i + 1} ({len(flipped)} points)\n"
+               "newpath\n"
+               f"{flipped[0, 0]} {flipped[0, 1]} moveto\n"
+               f"{body}stroke\n")
@@ -1,17 +1,8 @@
-import fitz
 import cv2
 import numpy as np
 import os
-
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+from _render_cache import get_page_array
+from _trace import trace_skeleton_paths
 
 def get_clean_lines(img):
     """获取干净的线条 - 去除毛刺"""
@@ -24,12 +15,10 @@ def get_clean_lines(img):
     
     edges = cv2.Canny(blurred, 40, 120, apertureSize=3)
     
-    kernel = np.ones((5, 5), np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel, iterations=3)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_OPEN, kernel, iterations=2)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((13, 13), np.uint8))
+    edges = cv2.morphologyEx(edges, cv2.MORPH_OPEN, np.ones((9, 9), np.uint8))
     
-    kernel2 = np.ones((3, 3), np.uint8)
-    edges = cv2.dilate(edges, kernel2, iterations=2)
+    edges = cv2.dilate(edges, np.ones((5, 5), np.uint8))
     
     return edges
 
@@ -37,6 +26,9 @@ def get_thin_lines(edges):
     """细化线条为单像素"""
     edges = np.uint8(edges)
     
+    if hasattr(cv2, "ximgproc"):
+        return cv2.ximgproc.thinning(edges, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+    
     dist = cv2.distanceTransform(edges, cv2.DIST_L1, 3)
     
     _, skeleton = cv2.threshold(dist, 0.5, 255, cv2.THRESH_BINARY)
@@ -46,57 +38,25 @@ def get_thin_lines(edges):
 
 def remove_noise_from_skeleton(skeleton, min_length=100):
     """从骨架中移除噪点"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    height, width = skeleton.shape
-    
-    valid_segments = []
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) >= min_length:
-                valid_segments.append(np.array(points))
-    
-    return valid_segments
+    return [path.astype(np.int16) for path in trace_skeleton_paths(skeleton, min_length)]
 
 def smooth_path(points, window=5):
     """移动平均平滑"""
     if len(points) < window:
         return points
     
-    smoothed = []
-    for i in range(len(points)):
-        start = max(0, i - window // 2)
-        end = min(len(points), i + window // 2 + 1)
-        
-        window_points = points[start:end]
-        
-        if len(window_points) > 0:
-            avg_x = int(np.mean([p[0] for p in window_points]))
-            avg_y = int(np.mean([p[1] for p in window_points]))
-            smoothed.append((avg_x, avg_y))
+    pts = np.asarray(points, dtype=np.float64)
+    n = len(pts)
+    
+    cs = np.cumsum(np.pad(pts, ((1, 0), (0, 0))), axis=0)
+    idx = np.arange(n)
+    starts = np.clip(idx - window // 2, 0, n)
+    ends = np.clip(idx + window // 2 + 1, 0, n)
     
-    return np.array(smoothed)
+    sums = cs[ends] - cs[starts]
+    counts = (ends - starts)[:, None]
+    
+    return (sums / counts).astype(np.int16)
 
 def chaikin_smooth(points, iterations=2):
     """Chaikin's corner cutting smoothing"""
@@ -104,75 +64,69 @@ def chaikin_smooth(points, iterations=2):
         return points
     
     def chaikin_step(pts):
-        new_pts = [pts[0]]
-        for i in range(len(pts) - 1):
-            p0 = pts[i]
-            p1 = pts[i + 1]
-            q = (0.75 * p0[0] + 0.25 * p1[0], 0.75 * p0[1] + 0.25 * p1[1])
-            r = (0.25 * p0[0] + 0.75 * p1[0], 0.25 * p0[1] + 0.75 * p1[1])
-            new_pts.append(q)
-            new_pts.append(r)
-        new_pts.append(pts[-1])
-        return np.array(new_pts)
-    
-    result = points.copy()
+        new_pts = np.empty((2 * len(pts), 2), dtype=np.float32)
+        new_pts[0] = pts[0]
+        new_pts[1:-1:2] = 0.75 * pts[:-1] + 0.25 * pts[1:]
+        new_pts[2:-1:2] = 0.25 * pts[:-1] + 0.75 * pts[1:]
+        new_pts[-1] = pts[-1]
+        return new_pts
+    
+    result = np.asarray(points, dtype=np.float32)
     for _ in range(iterations):
         result = chaikin_step(result)
     
     return result
 
 def simplify_path_points(points, tolerance=8):
-    """简化路径点"""
+    """简化路径点 (Douglas-Peucker)"""
     if len(points) < 3:
         return points
     
-    simplified = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= tolerance:
-            simplified.append(points[i])
-    
-    return np.array(simplified)
+    pts = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+    return cv2.approxPolyDP(pts, tolerance, closed=False).reshape(-1, 2)
 
 def merge_close_points(points, threshold=10):
     """合并相近的点"""
     if len(points) < 2:
         return points
     
-    merged = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - merged[-1][0])**2 + 
-                       (points[i][1] - merged[-1][1])**2)
-        if dist >= threshold:
-            merged.append(points[i])
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
     
-    return np.array(merged)
+    idx = np.searchsorted(cum, np.arange(0, cum[-1], threshold))
+    return pts[np.unique(np.clip(idx, 0, len(pts) - 1))]
 
-def smooth_and_clean(img):
-    """完整的平滑去毛刺流程"""
+def _smooth_one(segment):
+    """单条线段的平滑流程，过短时返回 None"""
+    if len(segment) < 10:
+        return None
+    
+    smoothed = smooth_path(segment, window=7)
+    if len(smoothed) > 4:
+        chaikin = chaikin_smooth(smoothed, iterations=1)
+        if len(chaikin) > 4:
+            simplified = simplify_path_points(chaikin, tolerance=10)
+            if len(simplified) >= 2:
+                merged = merge_close_points(simplified, threshold=8)
+                if len(merged) >= 2:
+                    return merged
+    
+    return None
+
+def smooth_and_clean(img, scale=1):
+    """完整的平滑去毛刺流程，边缘在原分辨率上清理，细化前缩小 scale 倍"""
     edges = get_clean_lines(img)
     
-    skeleton = get_thin_lines(edges)
+    small = cv2.resize(edges, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_NEAREST)
+    skeleton = get_thin_lines(small)
     
-    segments = remove_noise_from_skeleton(skeleton, min_length=80)
+    segments = remove_noise_from_skeleton(skeleton, min_length=round(80 / scale))
+    segments = [np.rint(segment * scale).astype(np.int16) for segment in segments]
     
-    smoothed_segments = []
-    for segment in segments:
-        if len(segment) < 10:
-            continue
-        
-        smoothed = smooth_path(segment, window=7)
-        if len(smoothed) > 4:
-            chaikin = chaikin_smooth(smoothed, iterations=1)
-            if len(chaikin) > 4:
-                simplified = simplify_path_points(chaikin, tolerance=10)
-                if len(simplified) > 4:
-                    merged = merge_close_points(simplified, threshold=8)
-                    if len(merged) > 4:
-                        smoothed_segments.append(merged)
-    
-    return smoothed_segments
+    results = (_smooth_one(segment) for segment in segments)
+    
+    return [r for r in results if r is not None]
 
 def output_svg(paths, output_path, width, height):
     """输出SVG"""
@@ -189,23 +143,20 @@ def output_svg(paths, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = path.reshape(-1, 2)
+        for i, path in enumerate(paths):
+            if len(path) < 2:
+                continue
+            
+            points = path.reshape(-1, 2).tolist()
+            
+            body = "".join(f"L {x} {y} " for x, y in points[1:])
+            f.write(f'    <path id="p{i}" d="M {points[0][0]} {points[0][1]} {body}"/>\n')
         
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     return total_points
 
@@ -229,48 +180,42 @@ def output_ai(paths, output_path, width, height):
 
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+        for i, path in enumerate(paths):
+            if len(path) < 2:
+                continue
+            
+            pts = path.reshape(-1, 2)
+            xs = pts[:, 0].tolist()
+            ys = (height - pts[:, 1]).tolist()
+            
+            body = "".join(f"{x} {y} lineto\n" for x, y in zip(xs[1:], ys[1:]))
+            f.write(f"\n% Path {i + 1} ({len(xs)} points)\n"
+                    "newpath\n"
+                    f"{xs[0]} {ys[0]} moveto\n"
+                    f"{body}stroke\n")
         
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
-def process_clean_lines(pdf_path="a.pdf"):
+def process_clean_lines(pdf_path="a.pdf", scale=1.5):
     """处理干净的线条"""
     print("=" * 60)
     print("PDF 干净线条处理 (无毛刺)")
     print("=" * 60)
     
     print("\n[1/4] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/4] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
     
     print("\n[3/4] 平滑去毛刺...")
-    paths = smooth_and_clean(img)
+    paths = smooth_and_clean(img, scale)
     print(f"    提取路径: {len(paths)} 条")
     
     total_points = sum(len(p) for p in paths)
@@ -1,21 +1,7 @@
-import fitz
 import cv2
 import numpy as np
 import os
-
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    """将PDF页面提取为高分辨率图片"""
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    
-    doc.close()
-    return output_path
+from _render_cache import get_page_array
 
 def get_continuous_skeleton(img):
     """获取连续的骨架线"""
@@ -88,40 +74,37 @@ def merge_lines(lines, width, height):
     if lines is None:
         return []
     
+    arr = np.asarray(lines, dtype=np.int64).reshape(-1, 4)
+    starts = arr[:, 0:2]
+    ends = arr[:, 2:4]
+    threshold_sq = 30 * 30
+    
     merged = []
-    used = [False] * len(lines)
+    used = np.zeros(len(arr), dtype=bool)
     
-    for i in range(len(lines)):
+    for i in range(len(arr)):
         if used[i]:
             continue
         
-        x1, y1, x2, y2 = lines[i]
+        d_sq = np.minimum(
+            np.minimum(((ends[i] - starts) ** 2).sum(axis=1),
+                       ((ends[i] - ends) ** 2).sum(axis=1)),
+            np.minimum(((starts[i] - starts) ** 2).sum(axis=1),
+                       ((starts[i] - ends) ** 2).sum(axis=1)))
         
-        for j in range(i + 1, len(lines)):
-            if used[j]:
-                continue
-            
-            x3, y3, x4, y4 = lines[j]
-            
-            if self_connect(x1, y1, x2, y2, x3, y3, x4, y4, threshold=30):
-                x1, y1 = min(x1, x3), min(y1, y3)
-                x2, y2 = max(x2, x4), max(y2, y4)
-                used[j] = True
+        group = d_sq < threshold_sq
+        group[:i + 1] = False
+        group &= ~used
+        group[i] = True
+        
+        x1, y1 = starts[group].min(axis=0)
+        x2, y2 = ends[group].max(axis=0)
         
         merged.append((x1, y1, x2, y2))
-        used[i] = True
+        used[group] = True
     
     return merged
 
-def self_connect(x1, y1, x2, y2, x3, y3, x4, y4, threshold=30):
-    """检查两条线是否应该连接"""
-    dist1 = np.sqrt((x2 - x3) ** 2 + (y2 - y3) ** 2)
-    dist2 = np.sqrt((x2 - x4) ** 2 + (y2 - y4) ** 2)
-    dist3 = np.sqrt((x1 - x3) ** 2 + (y1 - y3) ** 2)
-    dist4 = np.sqrt((x1 - x4) ** 2 + (y1 - y4) ** 2)
-    
-    return min(dist1, dist2, dist3, dist4) < threshold
-
 def smooth_lines(lines, img_shape):
     """平滑线段"""
     smoothed = []
@@ -152,14 +135,14 @@ def to_svg(lines, output_path, width, height):
   <g id="lines" stroke="black" fill="none" stroke-width="1">
 '''
     
-    for i, (x1, y1, x2, y2) in enumerate(lines):
-        svg_content += f'    <line id="l{i}" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        
+        for i, (x1, y1, x2, y2) in enumerate(lines):
+            f.write(f'    <line id="l{i}" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}"/>\n')
+        
+        f.write('''  </g>
+</svg>''')
 
 def to_ai(lines, output_path, width, height):
     """转为AI"""
@@ -181,18 +164,18 @@ def to_ai(lines, output_path, width, height):
 
 '''
     
-    for i, (x1, y1, x2, y2) in enumerate(lines):
-        ai_content += f"\n% Line {i + 1}\n"
-        ai_content += "newpath\n"
-        ai_content += f"{x1} {height - y1} moveto\n"
-        ai_content += f"{x2} {height - y2} lineto\n"
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(ai_content)
+        
+        for i, (x1, y1, x2, y2) in enumerate(lines):
+            f.write(f"\n% Line {i + 1}\n"
+                    "newpath\n"
+                    f"{x1} {height - y1} moveto\n"
+                    f"{x2} {height - y2} lineto\n"
+                    "stroke\n")
+        
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
 def to_svg_path(contours, output_path, width, height):
     """将轮廓转为连续路径SVG"""
@@ -208,23 +191,20 @@ def to_svg_path(contours, output_path, width, height):
 '''
     
     total_points = 0
-    for i, contour in enumerate(contours):
-        points = contour.reshape(-1, 2)
-        if len(points) < 2:
-            continue
-        
-        total_points += len(points)
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        
+        for i, contour in enumerate(contours):
+            points = contour.reshape(-1, 2).tolist()
+            if len(points) < 2:
+                continue
+            
+            total_points += len(points)
+            body = "".join(f"L {x} {y} " for x, y in points[1:])
+            f.write(f'    <path id="p{i}" d="M {points[0][0]} {points[0][1]} {body}"/>\n')
+        
+        f.write('''  </g>
+</svg>''')
     
     return len(contours), total_points
 
@@ -248,26 +228,25 @@ def to_ai_path(contours, output_path, width, height):
 
 '''
     
-    for i, contour in enumerate(contours):
-        points = contour.reshape(-1, 2)
-        if len(points) < 2:
-            continue
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+        for i, contour in enumerate(contours):
+            if len(contour) < 2:
+                continue
+            
+            pts = contour.reshape(-1, 2)
+            xs = pts[:, 0].tolist()
+            ys = (height - pts[:, 1]).tolist()
+            
+            body = "".join(f"{x} {y} lineto\n" for x, y in zip(xs[1:], ys[1:]))
+            f.write(f"\n% Path {i + 1} ({len(xs)} points)\n"
+                    "newpath\n"
+                    f"{xs[0]} {ys[0]} moveto\n"
+                    f"{body}stroke\n")
         
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     return len(contours)
 
@@ -302,20 +281,16 @@ def extract_continuous_contours(img):
     
     return contours_sorted
 
-def process_continuous_lines(pdf_path="a.pdf"):
+def process_continuous_lines(pdf_path="a.pdf", scale=1):
     """处理连续的线条"""
     print("=" * 60)
     print("PDF 连续线条描边")
     print("=" * 60)
     
     print("\n[1/3] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300 / scale)
     
     print("\n[2/3] 处理图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    图片尺寸: {width}x{height}")
@@ -326,6 +301,9 @@ def process_continuous_lines(pdf_path="a.pdf"):
     contours = extract_continuous_contours(img)
     
     print("\n    生成矢量文件...")
+    contours = [np.rint(c * scale).astype(np.int32) for c in contours]
+    width, height = round(width * scale), round(height * scale)
+    
     path_count, point_count = to_svg_path(contours, f"{base_name}.svg", width, height)
     print(f"    SVG: {path_count} 条路径, {point_count} 个点")
     
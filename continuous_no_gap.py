@@ -1,20 +1,12 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from scipy.spatial import cKDTree
+from _render_cache import get_page_array
+from _trace import trace_skeleton_paths
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
-
-def get_continuous_skeleton(img):
-    """获取连续的骨架线"""
+def get_continuous_skeleton(img, scale=1):
+    """获取连续的骨架线，形态学在原分辨率上完成，细化前缩小 scale 倍"""
     if len(img.shape) == 3:
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     else:
@@ -22,10 +14,15 @@ def get_continuous_skeleton(img):
     
     _, binary = cv2.threshold(gray, 50, 255, cv2.THRESH_BINARY_INV)
     
-    kernel = np.ones((3, 3), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=6)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=2)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((13, 13), np.uint8))
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+    
+    if hasattr(cv2, "ximgproc"):
+        binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((7, 7), np.uint8))
+        binary = cv2.resize(binary, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_NEAREST)
+        return cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
     
+    binary = cv2.resize(binary, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_NEAREST)
     dist = cv2.distanceTransform(binary, cv2.DIST_L1, 5)
     
     _, skeleton = cv2.threshold(dist, 0.5, 255, cv2.THRESH_BINARY)
@@ -38,30 +35,13 @@ def get_continuous_skeleton(img):
 
 def extract_endpoints(skeleton):
     """提取骨架端点"""
-    height, width = skeleton.shape
-    
-    kernel = np.array([[0, 1, 0],
-                      [1, 1, 1],
-                      [0, 1, 0]], dtype=np.uint8)
-    
-    neighbors = cv2.filter2D(skeleton, -1, kernel)
+    sk01 = (skeleton > 0).astype(np.uint8)
     
-    endpoints = np.zeros(skeleton.shape, np.uint8)
-    endpoints[(skeleton > 0) & (neighbors == 255)] = 255
+    neighbors = cv2.filter2D(sk01, cv2.CV_8U, np.ones((3, 3), np.uint8), borderType=cv2.BORDER_CONSTANT)
     
-    endpoints = cv2.medianBlur(endpoints, 3)
+    ys, xs = np.nonzero((sk01 == 1) & (neighbors == 2))
     
-    contours, _ = cv2.findContours(endpoints, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    
-    endpoint_points = []
-    for contour in contours:
-        M = cv2.moments(contour)
-        if M["m00"] > 0:
-            cx = int(M["m10"] / M["m00"])
-            cy = int(M["m01"] / M["m00"])
-            endpoint_points.append((cx, cy))
-    
-    return np.array(endpoint_points)
+    return np.column_stack((xs, ys))
 
 def find_close_endpoints(endpoints, max_dist=30):
     """找到需要连接的相邻端点"""
@@ -69,30 +49,30 @@ def find_close_endpoints(endpoints, max_dist=30):
     if n < 2:
         return []
     
+    tree = cKDTree(endpoints)
+    neighbors = tree.query_ball_point(endpoints, r=max_dist, return_sorted=True)
+    
     connections = []
-    used = set()
+    used = np.zeros(n, dtype=bool)
     
     for i in range(n):
-        if i in used:
+        if used[i]:
             continue
         
-        min_dist = max_dist
-        closest = -1
+        candidates = [j for j in neighbors[i] if j > i and not used[j]]
+        if not candidates:
+            continue
         
-        for j in range(i + 1, n):
-            if j in used:
-                continue
-            
-            dist = np.sqrt((endpoints[i][0] - endpoints[j][0])**2 + 
-                          (endpoints[i][1] - endpoints[j][1])**2)
-            if dist < min_dist:
-                min_dist = dist
-                closest = j
+        candidates = np.array(candidates)
+        dist_sq = ((endpoints[candidates] - endpoints[i]) ** 2).sum(axis=1)
+        k = np.argmin(dist_sq)
+        if dist_sq[k] >= max_dist * max_dist:
+            continue
         
-        if closest != -1:
-            connections.append((endpoints[i], endpoints[closest]))
-            used.add(i)
-            used.add(closest)
+        closest = candidates[k]
+        connections.append((endpoints[i], endpoints[closest]))
+        used[i] = True
+        used[closest] = True
     
     return connections
 
@@ -110,38 +90,7 @@ def connect_endpoints(skeleton, connections, height, width):
 
 def skeleton_to_contours(skeleton):
     """骨架转为连续轮廓"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    contours = []
-    
-    height, width = skeleton.shape
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) > 5:
-                contours.append(np.array(points))
-    
-    return contours
+    return [path.astype(np.int16) for path in trace_skeleton_paths(skeleton, min_length=6)]
 
 def remove_short_segments(contours, min_length=20):
     """移除过短的线段"""
@@ -160,18 +109,12 @@ def remove_short_segments(contours, min_length=20):
     return filtered
 
 def simplify_contour(points, tolerance=3):
-    """简化轮廓"""
+    """简化轮廓 (Douglas-Peucker)"""
     if len(points) < 3:
         return points
     
-    simplified = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= tolerance:
-            simplified.append(points[i])
-    
-    return np.array(simplified)
+    pts = np.asarray(points).reshape(-1, 1, 2).astype(np.int32)
+    return cv2.approxPolyDP(pts, tolerance, closed=False).reshape(-1, 2)
 
 def output_svg(contours, output_path, width, height):
     """输出SVG"""
@@ -188,23 +131,20 @@ def output_svg(contours, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, contour in enumerate(contours):
-        if len(contour) < 2:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = contour.reshape(-1, 2)
+        for i, contour in enumerate(contours):
+            if len(contour) < 2:
+                continue
+            
+            points = contour.reshape(-1, 2).tolist()
+            
+            body = "".join(f"L {x} {y} " for x, y in points[1:])
+            f.write(f'    <path id="p{i}" d="M {points[0][0]} {points[0][1]} {body}"/>\n')
         
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     return total_points
 
@@ -228,54 +168,48 @@ def output_ai(contours, output_path, width, height):
 
 '''
     
-    for i, contour in enumerate(contours):
-        if len(contour) < 2:
-            continue
-        
-        points = contour.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+        for i, contour in enumerate(contours):
+            if len(contour) < 2:
+                continue
+            
+            pts = contour.reshape(-1, 2)
+            xs = pts[:, 0].tolist()
+            ys = (height - pts[:, 1]).tolist()
+            
+            body = "".join(f"{x} {y} lineto\n" for x, y in zip(xs[1:], ys[1:]))
+            f.write(f"\n% Path {i + 1} ({len(xs)} points)\n"
+                    "newpath\n"
+                    f"{xs[0]} {ys[0]} moveto\n"
+                    f"{body}stroke\n")
         
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
-def process_continuous(pdf_path="a.pdf"):
+def process_continuous(pdf_path="a.pdf", scale=1.5):
     """处理连续线条"""
     print("=" * 60)
     print("PDF 连续线条处理 (无断线)")
     print("=" * 60)
     
     print("\n[1/6] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/6] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
     
     print("\n[3/6] 获取骨架线...")
-    skeleton = get_continuous_skeleton(img)
+    skeleton = get_continuous_skeleton(img, scale)
     
     print("\n[4/6] 检测并连接断线...")
     endpoints = extract_endpoints(skeleton)
     print(f"    检测到 {len(endpoints)} 个端点")
     
-    connections = find_close_endpoints(endpoints, max_dist=40)
+    connections = find_close_endpoints(endpoints, max_dist=40 / scale)
     print(f"    需要连接 {len(connections)} 处断线")
     
     if connections:
@@ -283,6 +217,7 @@ def process_continuous(pdf_path="a.pdf"):
     
     print("\n[5/6] 提取连续轮廓...")
     contours = skeleton_to_contours(skeleton)
+    contours = [np.rint(c * scale).astype(np.int32) for c in contours]
     print(f"    原始轮廓: {len(contours)} 个")
     
     contours = remove_short_segments(contours, min_length=15)
@@ -1,101 +1,83 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=150):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+AI_NEWPATH = b"newpath\n"
+AI_STROKE = b"stroke\n"
+EDGE_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
 
 def get_edges(img):
     """获取边缘"""
+    src = cv2.UMat(img) if cv2.ocl.haveOpenCL() else img
+    
     if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
     else:
-        gray = img.copy()
+        gray = src
     
     blurred = cv2.GaussianBlur(gray, (5, 5), 1.5)
     edges = cv2.Canny(blurred, 35, 100, apertureSize=3)
     
-    kernel = np.ones((4, 4), np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel, iterations=2)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, EDGE_CLOSE_KERNEL, anchor=(4, 4))
     
-    return edges
+    return edges.get() if isinstance(edges, cv2.UMat) else edges
 
 def edges_to_paths_fast(edges):
     """快速边缘转路径"""
-    visited = np.zeros(edges.shape, np.uint8)
-    paths = []
-    h, w = edges.shape
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
     
-    for y in range(h):
-        for x in range(w):
-            if edges[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < w and 0 <= ny < h:
-                            if edges[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) > 30:
-                paths.append(np.array(points))
-    
-    return paths
+    return [c.reshape(-1, 2) for c in contours if len(c) > 30]
 
 def simple_simplify(points, tolerance=20):
     """简单简化"""
     if len(points) < 3:
         return points
     
-    simplified = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= tolerance:
-            simplified.append(points[i])
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + tolerance))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
     
-    return np.array(simplified)
+    return pts[keep]
 
 def simple_smooth(points, window=11):
     """简单移动平均"""
     if len(points) < window:
         return points
     
-    smoothed = []
+    pts = np.asarray(points, dtype=np.float64)
+    n = len(pts)
     half = window // 2
     
-    for i in range(len(points)):
-        start = max(0, i - half)
-        end = min(len(points), i + half)
-        
-        window_pts = points[start:end]
-        
-        avg_x = int(round(np.mean([p[0] for p in window_pts])))
-        avg_y = int(round(np.mean([p[1] for p in window_pts])))
-        
-        smoothed.append((avg_x, avg_y))
+    cs = np.cumsum(np.pad(pts, ((1, 0), (0, 0))), axis=0)
+    idx = np.arange(n)
+    starts = np.clip(idx - half, 0, n)
+    ends = np.clip(idx + half, 0, n)
     
-    return np.array(smoothed)
+    sums = cs[ends] - cs[starts]
+    counts = (ends - starts)[:, None]
+    
+    return np.rint(sums / counts).astype(np.int32)
+
+def _simplify_one(path):
+    """单条路径的平滑与简化，过短时返回 None"""
+    if len(path) < 10:
+        return None
+    
+    s1 = simple_smooth(path, window=9)
+    if len(s1) < 8:
+        return None
+    
+    s2 = simple_simplify(s1, tolerance=15)
+    return s2 if len(s2) > 3 else None
 
 def process_fast(pdf_path="a.pdf", line_width=4):
     """快速处理"""
@@ -105,13 +87,9 @@ def process_fast(pdf_path="a.pdf", line_width=4):
     print("=" * 60)
     
     print("\n[1/4] 提取页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=150)
+    img = get_page_array(pdf_path, dpi=150)
     
     print("\n[2/4] 处理图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取")
-        return
     
     h, w = img.shape[:2]
     print(f"    尺寸: {w}x{h}")
@@ -121,18 +99,8 @@ def process_fast(pdf_path="a.pdf", line_width=4):
     print(f"    路径: {len(paths)} 条")
     
     print("\n[3/4] 简化...")
-    final = []
-    for path in paths:
-        if len(path) < 10:
-            continue
-        
-        s1 = simple_smooth(path, window=9)
-        if len(s1) < 8:
-            continue
-        
-        s2 = simple_simplify(s1, tolerance=15)
-        if len(s2) > 3:
-            final.append(s2)
+    with ThreadPoolExecutor() as ex:
+        final = [p for p in ex.map(_simplify_one, paths) if p is not None]
     
     print(f"    优化后: {len(final)} 条")
     total = sum(len(p) for p in final)
@@ -158,21 +126,18 @@ def write_svg(path_list, output_path, w, h, lw):
   <g stroke="black" fill="none" stroke-width="{lw}" stroke-linecap="round" stroke-linejoin="round">
 '''
     
-    for i, path_data in enumerate(path_list):
-        if len(path_data) < 2:
-            continue
-        p = path_data.reshape(-1, 2)
-        s += f'    <path id="p{i}" d="'
-        s += f"M {p[0][0]} {p[0][1]} "
-        for j in range(1, len(p)):
-            s += f"L {p[j][0]} {p[j][1]} "
-        s += '"/>\n'
-    
-    s += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(s)
+        
+        for i, path_data in enumerate(path_list):
+            if len(path_data) < 2:
+                continue
+            f.write(f'    <path id="p{i}" d="M {path_data[0, 0]} {path_data[0, 1]} ')
+            f.write(("L %d %d " * (len(path_data) - 1)) % tuple(path_data[1:].ravel().tolist()))
+            f.write('"/>\n')
+        
+        f.write('''  </g>
+</svg>''')
     
     print(f"    SVG: {len(path_list)} 条, {pts} 点")
 
@@ -189,23 +154,21 @@ def write_ai(path_list, output_path, w, h, lw):
 
 '''
     hi = int(h)
-    
-    for i, path_data in enumerate(path_list):
-        if len(path_data) < 2:
-            continue
-        p = path_data.reshape(-1, 2)
-        a += f"\n% Path {i + 1} ({len(p)} pts)\n"
-        a += "newpath\n"
-        a += f"{p[0][0]} {hi - p[0][1]} moveto\n"
-        for j in range(1, len(p)):
-            x, y = p[j]
-            a += f"{x} {hi - y} lineto\n"
-        a += "stroke\n"
-    
-    a += "\nshowpage\n%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(a)
+    with open(output_path, "wb", buffering=1 << 20) as f:
+        f.write(a.encode("utf-8"))
+        
+        for i, path_data in enumerate(path_list):
+            if len(path_data) < 2:
+                continue
+            flipped = path_data.copy()
+            flipped[:, 1] = hi - flipped[:, 1]
+            f.write(b"\n%% Path %d (%d pts)\n" % (i + 1, len(flipped)))
+            f.write(AI_NEWPATH)
+            f.write(b"%d %d moveto\n" % (flipped[0, 0], flipped[0, 1]))
+            f.write((b"%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist()))
+            f.write(AI_STROKE)
+        
+        f.write(b"\nshowpage\n%%EndDocument\n")
     
     print(f"    AI: {len(path_list)} 条")
 
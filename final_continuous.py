@@ -1,135 +1,66 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from scipy.spatial import cKDTree
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array
+from _trace import trace_skeleton_paths
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+AI_NEWPATH = b"newpath\n"
+AI_STROKE = b"stroke\n"
 
 def get_continuous_skeleton(img):
     """获取连续的骨架线 - 增强版"""
+    src = cv2.UMat(img) if cv2.ocl.haveOpenCL() else img
+    
     if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
     else:
-        gray = img.copy()
+        gray = src
     
     _, binary = cv2.threshold(gray, 55, 255, cv2.THRESH_BINARY_INV)
     
-    kernel = np.ones((4, 4), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=5)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, np.ones((16, 16), np.uint8), anchor=(10, 10))
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
     
-    kernel2 = np.ones((3, 3), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel2, iterations=2)
+    if hasattr(cv2, "ximgproc"):
+        skeleton = cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_GUOHALL)
+        return skeleton.get() if isinstance(skeleton, cv2.UMat) else skeleton
     
     dist = cv2.distanceTransform(binary, cv2.DIST_L1, 3)
     
     _, skeleton = cv2.threshold(dist, 0.3, 255, cv2.THRESH_BINARY)
-    skeleton = np.uint8(skeleton)
+    skeleton = cv2.convertScaleAbs(skeleton)
     
-    kernel3 = np.ones((3, 3), np.uint8)
-    skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, kernel3, iterations=4)
+    skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, np.ones((9, 9), np.uint8))
     
-    return skeleton
+    return skeleton.get() if isinstance(skeleton, cv2.UMat) else skeleton
 
 def skeleton_to_continuous_paths(skeleton):
     """骨架转为连续路径"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    all_paths = []
-    
-    height, width = skeleton.shape
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            path = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                path.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(path) > 10:
-                all_paths.append(np.array(path))
-    
-    return all_paths
+    return trace_skeleton_paths(skeleton, min_length=11)
 
 def simplify_path_douglas(points, tolerance=5):
     """Douglas-Peucker路径简化"""
     if len(points) <= 2:
         return points
     
-    def point_to_line_dist(p, a, b):
-        """点到直线的距离"""
-        ax, ay = a
-        bx, by = b
-        px, py = p
-        
-        dx = bx - ax
-        dy = by - ay
-        
-        if dx == 0 and dy == 0:
-            return np.sqrt((px-ax)**2 + (py-ay)**2)
-        
-        t = max(0, min(1, ((px-ax)*dx + (py-ay)*dy) / (dx*dx + dy*dy)))
-        
-        nearest_x = ax + t * dx
-        nearest_y = ay + t * dy
-        
-        return np.sqrt((px-nearest_x)**2 + (py-nearest_y)**2)
-    
-    def recursive_simplify(pts, start, end, tol):
-        if end - start <= 1:
-            return [pts[start]]
-        
-        max_dist = 0
-        max_idx = start
-        
-        a = pts[start]
-        b = pts[end]
-        
-        for i in range(start + 1, end):
-            dist = point_to_line_dist(pts[i], a, b)
-            if dist > max_dist:
-                max_dist = dist
-                max_idx = i
-        
-        if max_dist > tol:
-            left = recursive_simplify(pts, start, max_idx, tol)
-            right = recursive_simplify(pts, max_idx, end, tol)
-            return left + right[1:]
-        else:
-            return [pts[start], pts[end]]
-    
-    result = recursive_simplify(points, 0, len(points)-1, tolerance)
-    return np.array(result)
+    curve = np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+    return cv2.approxPolyDP(curve, float(tolerance), closed=False).reshape(-1, 2)
 
 def merge_adjacent_paths(paths, max_gap=100):
     """合并相邻路径"""
     if len(paths) <= 1:
         return paths
     
+    starts = np.array([p[0] for p in paths])
+    ends = np.array([p[-1] for p in paths])
+    start_tree = cKDTree(starts)
+    end_tree = cKDTree(ends)
+    
+    max_gap_sq = max_gap * max_gap
     merged = []
-    used = [False] * len(paths)
+    used = np.zeros(len(paths), dtype=bool)
     
     for i in range(len(paths)):
         if used[i]:
@@ -137,24 +68,29 @@ def merge_adjacent_paths(paths, max_gap=100):
         
         current = paths[i]
         used[i] = True
+        last = i
         
-        for j in range(i + 1, len(paths)):
-            if used[j]:
-                continue
+        while True:
+            near = set(start_tree.query_ball_point(current[-1], max_gap))
+            near.update(end_tree.query_ball_point(current[0], max_gap))
             
-            other = paths[j]
-            
-            d1 = np.sqrt((current[-1][0] - other[0][0])**2 + 
-                        (current[-1][1] - other[0][1])**2)
-            d2 = np.sqrt((current[0][0] - other[-1][0])**2 + 
-                        (current[0][1] - other[-1][1])**2)
+            for j in sorted(near):
+                if j <= last or used[j]:
+                    continue
+                
+                d1 = ((current[-1] - starts[j]) ** 2).sum()
+                d2 = ((current[0] - ends[j]) ** 2).sum()
+                if d1 < max_gap_sq or d2 < max_gap_sq:
+                    break
+            else:
+                break
             
-            if d1 < max_gap or d2 < max_gap:
-                if d1 < d2:
-                    current = np.vstack([current, other])
-                else:
-                    current = np.vstack([other, current])
-                used[j] = True
+            if d1 < d2:
+                current = np.concatenate((current, paths[j]))
+            else:
+                current = np.concatenate((paths[j], current))
+            used[j] = True
+            last = j
         
         merged.append(current)
     
@@ -165,14 +101,31 @@ def reduce_point_density(points, min_dist=4):
     if len(points) < 2:
         return points
     
-    reduced = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - reduced[-1][0])**2 + 
-                       (points[i][1] - reduced[-1][1])**2)
-        if dist >= min_dist:
-            reduced.append(points[i])
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + min_dist))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
     
-    return np.array(reduced)
+    return pts[keep]
+
+def _simplify_one(path):
+    """单条路径的降密与简化，过短时返回 None"""
+    if len(path) < 3:
+        return None
+    
+    reduced = reduce_point_density(path, min_dist=3)
+    if len(reduced) > 2:
+        simplified = simplify_path_douglas(reduced, tolerance=4)
+        if len(simplified) > 2:
+            return simplified
+    
+    return None
 
 def process_continuous(pdf_path="a.pdf"):
     """处理连续线条 - 最终版"""
@@ -181,13 +134,9 @@ def process_continuous(pdf_path="a.pdf"):
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/5] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
@@ -202,15 +151,8 @@ def process_continuous(pdf_path="a.pdf"):
     paths = merge_adjacent_paths(paths, max_gap=80)
     print(f"    合并后: {len(paths)} 条")
     
-    optimized = []
-    for path in paths:
-        if len(path) < 3:
-            continue
-        reduced = reduce_point_density(path, min_dist=3)
-        if len(reduced) > 2:
-            simplified = simplify_path_douglas(reduced, tolerance=4)
-            if len(simplified) > 2:
-                optimized.append(simplified)
+    with ThreadPoolExecutor() as ex:
+        optimized = [p for p in ex.map(_simplify_one, paths) if p is not None]
     
     print(f"    优化后: {len(optimized)} 条")
     
@@ -249,23 +191,19 @@ def output_svg(paths, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = path.reshape(-1, 2)
+        for i, path in enumerate(paths):
+            if len(path) < 2:
+                continue
+            
+            f.write(f'    <path id="p{i}" d="M {path[0, 0]} {path[0, 1]} ')
+            f.write(("L %d %d " * (len(path) - 1)) % tuple(path[1:].ravel().tolist()))
+            f.write('"/>\n')
         
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     print(f"    SVG: {len(paths)} 条, {total_points} 点")
 
@@ -289,27 +227,24 @@ def output_ai(paths, output_path, width, height):
 
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-        
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+    with open(output_path, "wb", buffering=1 << 20) as f:
+        f.write(ai_content.encode("utf-8"))
         
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        for i, path in enumerate(paths):
+            if len(path) < 2:
+                continue
+            
+            flipped = path.copy()
+            flipped[:, 1] = height - flipped[:, 1]
+            
+            f.write(b"\n%% Path %d (%d points)\n" % (i + 1, len(flipped)))
+            f.write(AI_NEWPATH)
+            f.write(b"%d %d moveto\n" % (flipped[0, 0], flipped[0, 1]))
+            f.write((b"%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist()))
+            f.write(AI_STROKE)
+        
+        f.write(b"\nshowpage\n")
+        f.write(b"%%EndDocument\n")
     
     print(f"    AI: {len(paths)} 条")
 
@@ -1,162 +1,73 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from scipy.interpolate import splprep, splev
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=150):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+AI_NEWPATH = b"newpath\n"
+AI_STROKE = b"stroke\n"
 
 def get_smooth_edges(img):
     """获取平滑边缘"""
+    src = cv2.UMat(img) if cv2.ocl.haveOpenCL() else img
+    
     if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
     else:
-        gray = img.copy()
+        gray = src
     
     blurred = cv2.GaussianBlur(gray, (7, 7), 2)
     
     edges = cv2.Canny(blurred, 40, 120, apertureSize=3)
     
-    kernel = np.ones((5, 5), np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel, iterations=3)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((13, 13), np.uint8))
     
-    return edges
+    return edges.get() if isinstance(edges, cv2.UMat) else edges
 
 def edges_to_paths(edges):
     """边缘转路径"""
-    visited = np.zeros(edges.shape, np.uint8)
-    paths = []
-    height, width = edges.shape
-    
-    for y in range(height):
-        for x in range(width):
-            if edges[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if edges[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) > 30:
-                paths.append(np.array(points))
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_NONE)
     
-    return paths
+    return [c.reshape(-1, 2) for c in contours if len(c) > 30]
 
-def ramer_douglas_pecker(points, epsilon):
-    """Ramer-Douglas-Peucker 简化算法"""
-    if len(points) < 3:
-        return points
-    
-    def perpendicular_distance(point, line_start, line_end):
-        if np.allclose(line_start, line_end):
-            return np.linalg.norm(point - line_start)
-        
-        line_vec = line_end - line_start
-        point_vec = point - line_start
-        line_len = np.linalg.norm(line_vec)
-        line_unitvec = line_vec / line_len
-        proj_length = np.dot(point_vec, line_unitvec)
-        proj_length = np.clip(proj_length, 0, line_len)
-        nearest = line_start + proj_length * line_unitvec
-        return np.linalg.norm(point - nearest)
-    
-    def rdp(points, start, end, eps):
-        if end <= start + 1:
-            return [points[start]]
-        
-        max_dist = 0
-        max_idx = start
-        
-        line_start = points[start]
-        line_end = points[end]
-        
-        for i in range(start + 1, end):
-            d = perpendicular_distance(points[i], line_start, line_end)
-            if d > max_dist:
-                max_dist = d
-                max_idx = i
-        
-        if max_dist > eps:
-            left = rdp(points, start, max_idx, eps)
-            right = rdp(points, max_idx, end, eps)
-            return left[:-1] + right
-        else:
-            return [points[start], points[end]]
-    
-    return np.array(rdp(points, 0, len(points) - 1, epsilon))
+def spline_simplify(points, smoothing=2.0, density=10):
+    """B样条拟合，一次完成平滑和简化，拟合失败时返回 None"""
+    pts = np.asarray(points, dtype=np.float64)
+    keep = np.ones(len(pts), dtype=bool)
+    keep[1:] = np.any(np.diff(pts, axis=0) != 0, axis=1)
+    pts = pts[keep]
+    if len(pts) < 8:
+        return None
+    
+    try:
+        tck, _ = splprep([pts[:, 0], pts[:, 1]], s=len(pts) * smoothing, k=3)
+    except (TypeError, ValueError):
+        return None
+    
+    u_new = np.linspace(0, 1, max(8, len(pts) // density))
+    x_new, y_new = splev(u_new, tck)
+    
+    return np.rint(np.column_stack((x_new, y_new))).astype(np.int32)
 
-def aggressive_simplify(points, tolerance=15):
-    """激进简化"""
-    if len(points) < 3:
-        return points
-    
-    simplified = [points[0]]
+def _simplify_one(path):
+    """单条路径的样条拟合，过短时返回 None"""
+    if len(path) < 10:
+        return None
     
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= tolerance:
-            simplified.append(points[i])
-    
-    return np.array(simplified)
-
-def smooth_path_moving_avg(points, window=9):
-    """移动平均平滑"""
-    if len(points) < window:
-        return points
-    
-    smoothed = []
-    half = window // 2
-    
-    for i in range(len(points)):
-        start = max(0, i - half)
-        end = min(len(points), i + half + 1)
-        
-        window_pts = points[start:end]
-        
-        avg_x = int(np.round(np.mean([p[0] for p in window_pts])))
-        avg_y = int(np.round(np.mean([p[1] for p in window_pts])))
-        
-        smoothed.append((avg_x, avg_y))
-    
-    return np.array(smoothed)
+    return spline_simplify(path, smoothing=2.0, density=10)
 
 def process_smooth(pdf_path="a.pdf", line_width=4):
     """处理平滑线条"""
     print("=" * 60)
-    print("PDF 平滑线条处理 (RDP简化)")
+    print("PDF 平滑线条处理 (B样条简化)")
     print(f"线条宽度: {line_width}px")
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=150)
+    img = get_page_array(pdf_path, dpi=150)
     
     print("\n[2/5] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
@@ -169,20 +80,8 @@ def process_smooth(pdf_path="a.pdf", line_width=4):
     print(f"    原始路径: {len(paths)} 条")
     
     print("\n[4/5] 简化和平滑...")
-    final_paths = []
-    for path in paths:
-        if len(path) < 10:
-            continue
-        
-        smoothed = smooth_path_moving_avg(path, window=7)
-        if len(smoothed) < 8:
-            continue
-        
-        simplified = ramer_douglas_pecker(smoothed, epsilon=12)
-        if len(simplified) > 3:
-            final = aggressive_simplify(simplified, tolerance=10)
-            if len(final) > 3:
-                final_paths.append(final)
+    with ThreadPoolExecutor() as ex:
+        final_paths = [p for p in ex.map(_simplify_one, paths) if p is not None]
     
     print(f"    优化后: {len(final_paths)} 条")
     
@@ -217,23 +116,19 @@ def output_svg(paths, output_path, width, height, line_width):
   <g id="lines" stroke="black" fill="none" stroke-width="{line_width}" stroke-linecap="round" stroke-linejoin="round">
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = path.reshape(-1, 2)
+        for i, path in enumerate(paths):
+            if len(path) < 2:
+                continue
+            
+            f.write(f'    <path id="p{i}" d="M {path[0, 0]} {path[0, 1]} ')
+            f.write(("L %d %d " * (len(path) - 1)) % tuple(path[1:].ravel().tolist()))
+            f.write('"/>\n')
         
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     print(f"    SVG: {len(paths)} 条, {total_points} 点, 文件已保存")
 
@@ -261,27 +156,24 @@ def output_ai(paths, output_path, width, height, line_width):
 '''
     h = int(height)
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {h - points[0][1]} moveto\n"
+    with open(output_path, "wb", buffering=1 << 20) as f:
+        f.write(ai_content.encode("utf-8"))
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {h - y} lineto\n"
-        
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        for i, path in enumerate(paths):
+            if len(path) < 2:
+                continue
+            
+            flipped = path.copy()
+            flipped[:, 1] = h - flipped[:, 1]
+            
+            f.write(b"\n%% Path %d (%d points)\n" % (i + 1, len(flipped)))
+            f.write(AI_NEWPATH)
+            f.write(b"%d %d moveto\n" % (flipped[0, 0], flipped[0, 1]))
+            f.write((b"%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist()))
+            f.write(AI_STROKE)
+        
+        f.write(b"\nshowpage\n")
+        f.write(b"%%EndDocument\n")
     
     print(f"    AI: {len(paths)} 条, 文件已保存")
 
@@ -1,17 +1,10 @@
-import fitz
 import cv2
 import numpy as np
 import os
-
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+from collections import deque
+from scipy.spatial import cKDTree
+from _render_cache import get_page_array
+from _trace import trace_skeleton_paths
 
 def preprocess_image(img):
     """图像预处理"""
@@ -34,17 +27,7 @@ def preprocess_image(img):
 
 def adaptive_centerline(binary_img):
     """自适应中心线提取"""
-    binary = np.uint8(binary_img)
-    
-    dist = cv2.distanceTransform(binary, cv2.DIST_L1, 5)
-    
-    markers = np.zeros(dist.shape, np.int32)
-    markers[dist > 0.5] = 1
-    markers[dist > 2] = 2
-    markers[dist > 5] = 3
-    
-    _, skeleton = cv2.threshold(dist, 0.8, 255, cv2.THRESH_BINARY)
-    skeleton = np.uint8(skeleton)
+    skeleton = np.uint8(binary_img)
     
     kernel = np.ones((2, 2), np.uint8)
     skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, kernel, iterations=2)
@@ -53,100 +36,33 @@ def adaptive_centerline(binary_img):
 
 def trace_all_contours(skeleton):
     """追踪所有连通轮廓"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    contours = []
-    
-    height, width = skeleton.shape
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) > 5:
-                contours.append(np.array(points))
-    
-    return contours
+    return trace_skeleton_paths(skeleton, min_length=6)
 
 def optimize_contour(points, epsilon=1.5):
     """Douglas-Peucker轮廓优化"""
     if len(points) < 3:
         return np.array(points) if len(points) > 1 else np.array([])
     
-    def distance(p1, p2):
-        dx = p1[0] - p2[0]
-        dy = p1[1] - p2[1]
-        return np.sqrt(dx*dx + dy*dy)
-    
-    def douglas_peucker(start, end, pts, eps):
-        if end - start < 2:
-            return np.array([pts[start], pts[end]])
-        
-        start_point = pts[start]
-        end_point = pts[end]
-        
-        dx = end_point[0] - start_point[0]
-        dy = end_point[1] - start_point[1]
-        
-        line_len = np.sqrt(dx*dx + dy*dy)
-        if line_len < 0.001:
-            return np.array([start_point])
-        
-        max_dist = 0
-        max_idx = start
-        
-        for i in range(start + 1, end):
-            p = pts[i]
-            dist = abs(dx * (start_point[1] - p[1]) - dy * (start_point[0] - p[0])) / line_len
-            if dist > max_dist:
-                max_dist = dist
-                max_idx = i
-        
-        if max_dist > eps:
-            left = douglas_peucker(start, max_idx, pts, eps)
-            right = douglas_peucker(max_idx, end, pts, eps)
-            return np.vstack([left, right])
-        else:
-            return np.array([start_point, end_point])
-    
-    points = np.array(points)
-    if len(points) < 2:
-        return points
-    
-    return douglas_peucker(0, len(points)-1, points, epsilon)
+    curve = np.asarray(points, dtype=np.int32).reshape(-1, 1, 2)
+    return cv2.approxPolyDP(curve, float(epsilon), closed=False).reshape(-1, 2)
 
 def remove_redundant_points(points, min_dist=2):
     """移除冗余点"""
     if len(points) < 2:
         return points
     
-    filtered = [points[0]]
-    for i in range(1, len(points)):
-        p1 = filtered[-1]
-        p2 = points[i]
-        dist = np.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
-        if dist >= min_dist:
-            filtered.append(p2)
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
     
-    return np.array(filtered)
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + min_dist))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
+    
+    return pts[keep]
 
 def simplify_contour_aggressive(points, target_points=500):
     """激进简化轮廓"""
@@ -162,9 +78,8 @@ def simplify_contour_aggressive(points, target_points=500):
     if len(simplified) > target_points:
         simplified = simplified[:target_points]
     
-    if len(simplified) > 2:
-        if np.allclose(simplified[0], simplified[-1]):
-            simplified = simplified[:-1]
+    if len(simplified) > 2 and (simplified[0] == simplified[-1]).all():
+        simplified = simplified[:-1]
     
     return simplified
 
@@ -173,6 +88,12 @@ def merge_nearby_contours(contours, max_gap=50):
     if len(contours) < 2:
         return contours
     
+    starts = np.array([c[0] for c in contours])
+    ends = np.array([c[-1] for c in contours])
+    start_tree = cKDTree(starts)
+    end_tree = cKDTree(ends)
+    
+    max_gap_sq = max_gap * max_gap
     merged = []
     used = [False] * len(contours)
     
@@ -180,28 +101,33 @@ def merge_nearby_contours(contours, max_gap=50):
         if used[i]:
             continue
         
-        current = contours[i]
+        chain = deque([contours[i]])
         used[i] = True
+        last = i
         
-        for j in range(i + 1, len(contours)):
-            if used[j]:
-                continue
-            
-            other = contours[j]
+        while True:
+            near = set(start_tree.query_ball_point(chain[-1][-1], max_gap))
+            near.update(end_tree.query_ball_point(chain[0][0], max_gap))
             
-            dist1 = np.sqrt((current[-1][0] - other[0][0])**2 + 
-                           (current[-1][1] - other[0][1])**2)
-            dist2 = np.sqrt((current[0][0] - other[-1][0])**2 + 
-                           (current[0][1] - other[-1][1])**2)
+            for j in sorted(near):
+                if j <= last or used[j]:
+                    continue
+                
+                dist1 = ((chain[-1][-1] - starts[j]) ** 2).sum()
+                dist2 = ((chain[0][0] - ends[j]) ** 2).sum()
+                if dist1 < max_gap_sq or dist2 < max_gap_sq:
+                    break
+            else:
+                break
             
-            if dist1 < max_gap or dist2 < max_gap:
-                if dist1 < dist2:
-                    current = np.vstack([current, other])
-                else:
-                    current = np.vstack([other, current])
-                used[j] = True
+            if dist1 < dist2:
+                chain.append(contours[j])
+            else:
+                chain.appendleft(contours[j])
+            used[j] = True
+            last = j
         
-        merged.append(current)
+        merged.append(np.concatenate(chain))
     
     return merged
 
@@ -212,45 +138,10 @@ def connect_contours(contours, max_gap=30):
     
     connected = list(contours)
     
-    changed = True
-    iterations = 0
-    max_iterations = len(contours)
-    
-    while changed and iterations < max_iterations:
-        changed = False
-        iterations += 1
-        
-        result = []
-        used = [False] * len(connected)
-        
-        for i in range(len(connected)):
-            if used[i]:
-                continue
-            
-            current = connected[i]
-            used[i] = True
-            
-            for j in range(i + 1, len(connected)):
-                if used[j]:
-                    continue
-                
-                other = connected[j]
-                
-                d1 = np.sqrt((current[-1][0] - other[0][0])**2 + 
-                            (current[-1][1] - other[0][1])**2)
-                d2 = np.sqrt((current[0][0] - other[-1][0])**2 + 
-                            (current[0][1] - other[-1][1])**2)
-                
-                if d1 < max_gap or d2 < max_gap:
-                    if d1 < d2:
-                        current = np.vstack([current, other])
-                    else:
-                        current = np.vstack([other, current])
-                    used[j] = True
-                    changed = True
-            
-            result.append(current)
-        
+    for _ in range(len(contours)):
+        result = merge_nearby_contours(connected, max_gap)
+        if len(result) == len(connected):
+            break
         connected = result
     
     return connected
@@ -270,23 +161,20 @@ def output_svg(contours, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, contour in enumerate(contours):
-        if len(contour) < 2:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = contour.reshape(-1, 2)
+        for i, contour in enumerate(contours):
+            if len(contour) < 2:
+                continue
+            
+            points = contour.reshape(-1, 2)
+            
+            body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+            f.write(f'    <path id="p{i}" d="M {points[0][0]} {points[0][1]} {body}"/>\n')
         
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     return len(contours), total_points
 
@@ -310,27 +198,23 @@ def output_ai(contours, output_path, width, height):
 
 '''
     
-    for i, contour in enumerate(contours):
-        if len(contour) < 2:
-            continue
-        
-        points = contour.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+        for i, contour in enumerate(contours):
+            if len(contour) < 2:
+                continue
+            
+            points = contour.reshape(-1, 2).tolist()
+            
+            body = "".join(f"{x} {height - y} lineto\n" for x, y in points[1:])
+            f.write(f"\n% Path {i + 1} ({len(points)} points)\n"
+                    "newpath\n"
+                    f"{points[0][0]} {height - points[0][1]} moveto\n"
+                    f"{body}stroke\n")
         
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
 def process_optimized(pdf_path="a.pdf"):
     """优化后的处理流程"""
@@ -339,13 +223,9 @@ def process_optimized(pdf_path="a.pdf"):
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/5] 预处理图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
@@ -366,7 +246,7 @@ def process_optimized(pdf_path="a.pdf"):
     for contour in merged:
         if len(contour) < 3:
             continue
-        simplified = optimize_contour(list(contour), epsilon=2.0)
+        simplified = optimize_contour(contour, epsilon=2.0)
         cleaned = remove_redundant_points(simplified, min_dist=3)
         if len(cleaned) > 2:
             optimized.append(cleaned)
@@ -3,6 +3,7 @@ import cv2
 import numpy as np
 from PIL import Image
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 def extract_image_from_pdf(pdf_path, output_dir="extracted"):
     """从PDF中提取图片"""
@@ -49,11 +50,9 @@ def image_contours_to_svg(img_array, output_path, threshold=100, min_area=10):
     
     edges = cv2.Canny(blurred, threshold, threshold * 2)
     
-    kernel = np.ones((3, 3), np.uint8)
-    edges = cv2.dilate(edges, kernel, iterations=1)
-    edges = cv2.erode(edges, kernel, iterations=1)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
     
-    contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_TC89_KCOS)
     
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">
@@ -62,39 +61,27 @@ def image_contours_to_svg(img_array, output_path, threshold=100, min_area=10):
   <g id="all-contours" fill="none" stroke="black" stroke-width="1">
 '''
     
-    for i, contour in enumerate(contours):
-        area = cv2.contourArea(contour)
-        if area < min_area:
-            continue
-        
-        svg_content += f'    <path id="contour_{i}" d="'
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = contour.reshape(-1, 2)
-        if len(points) > 0:
-            svg_content += f"M {points[0][0]} {points[0][1]} "
+        for i, contour in enumerate(contours):
+            area = cv2.contourArea(contour)
+            if area < min_area:
+                continue
             
-            for j in range(1, len(points)):
-                svg_content += f"L {points[j][0]} {points[j][1]} "
+            points = contour.reshape(-1, 2)
             
-            svg_content += "Z"
+            body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+            f.write(f'    <path id="contour_{i}" d="M {points[0][0]} {points[0][1]} {body}Z" />\n')
         
-        svg_content += f'" />\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     print(f"已生成SVG: {output_path}")
     return len(contours)
 
-def create_layered_svg(img_array, output_path, num_levels=8):
-    """创建分层SVG（适合Adobe Illustrator编辑）"""
-    height, width = img_array.shape[:2]
-    
-    gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY) if len(img_array.shape) == 3 else img_array
-    
+def _layered_contours(gray, num_levels):
+    """按灰度阈值分层提取外轮廓"""
     levels = []
     for i in range(num_levels):
         threshold = int(255 * (i + 1) / (num_levels + 1))
@@ -103,6 +90,16 @@ def create_layered_svg(img_array, output_path, num_levels=8):
         contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         levels.append((threshold, contours))
     
+    return levels
+
+def create_layered_svg(img_array, output_path, num_levels=8):
+    """创建分层SVG（适合Adobe Illustrator编辑）"""
+    height, width = img_array.shape[:2]
+    
+    gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY) if len(img_array.shape) == 3 else img_array
+    
+    levels = _layered_contours(gray, num_levels)
+    
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">
   <title>Layered Vector Trace</title>
@@ -110,53 +107,41 @@ def create_layered_svg(img_array, output_path, num_levels=8):
     <style>
 '''
 
-    colors = ['#000000', '#1a1a1a', '#333333', '#4d4d4d', '#666666', '#808080', '#999999', '#b3b3b3']
-    for i in range(num_levels):
-        svg_content += f'      .layer-{i} {{ fill: {colors[i % len(colors)]}; stroke: none; opacity: {1 - i*0.1}; }}\n'
-        svg_content += f'      .layer-{i}-stroke {{ fill: none; stroke: {colors[i % len(colors)]}; stroke-width: 0.5; }}\n'
-
-    svg_content += '''    </style>
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
+        
+        colors = ['#000000', '#1a1a1a', '#333333', '#4d4d4d', '#666666', '#808080', '#999999', '#b3b3b3']
+        for i in range(num_levels):
+            f.write(f'      .layer-{i} {{ fill: {colors[i % len(colors)]}; stroke: none; opacity: {1 - i*0.1}; }}\n')
+            f.write(f'      .layer-{i}-stroke {{ fill: none; stroke: {colors[i % len(colors)]}; stroke-width: 0.5; }}\n')
+        
+        f.write('''    </style>
   </defs>
   <g id="background" fill="white">
     <rect width="100%" height="100%"/>
   </g>
-'''
-
-    for level_idx, (threshold, contours) in enumerate(levels):
-        svg_content += f'  <g id="layer_{level_idx}_fill" class="layer-{level_idx}">\n'
-        for i, contour in enumerate(contours):
-            area = cv2.contourArea(contour)
-            if area < 5:
-                continue
-            
-            points = contour.reshape(-1, 2)
-            if len(points) > 0:
-                svg_content += f'    <path id="l{level_idx}_c{i}" d="'
-                svg_content += f"M {points[0][0]} {points[0][1]} "
-                for j in range(1, len(points)):
-                    svg_content += f"L {points[j][0]} {points[j][1]} "
-                svg_content += f'Z"/>\n'
-        svg_content += '  </g>\n'
+''')
         
-        svg_content += f'  <g id="layer_{level_idx}_stroke" class="layer-{level_idx}-stroke">\n'
-        for i, contour in enumerate(contours):
-            area = cv2.contourArea(contour)
-            if area < 5:
-                continue
+        for level_idx, (threshold, contours) in enumerate(levels):
+            paths = []
+            for i, contour in enumerate(contours):
+                area = cv2.contourArea(contour)
+                if area < 5:
+                    continue
+                
+                points = contour.reshape(-1, 2)
+                body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+                paths.append((i, f"M {points[0][0]} {points[0][1]} {body}Z"))
             
-            points = contour.reshape(-1, 2)
-            if len(points) > 0:
-                svg_content += f'    <path id="ls{level_idx}_c{i}" d="'
-                svg_content += f"M {points[0][0]} {points[0][1]} "
-                for j in range(1, len(points)):
-                    svg_content += f"L {points[j][0]} {points[j][1]} "
-                svg_content += f'Z"/>\n'
-        svg_content += '  </g>\n'
-    
-    svg_content += '</svg>'
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+            f.write(f'  <g id="layer_{level_idx}_fill" class="layer-{level_idx}">\n')
+            f.writelines(f'    <path id="l{level_idx}_c{i}" d="{d}"/>\n' for i, d in paths)
+            f.write('  </g>\n')
+            
+            f.write(f'  <g id="layer_{level_idx}_stroke" class="layer-{level_idx}-stroke">\n')
+            f.writelines(f'    <path id="ls{level_idx}_c{i}" d="{d}"/>\n' for i, d in paths)
+            f.write('  </g>\n')
+        
+        f.write('</svg>')
     
     print(f"已生成分层SVG: {output_path}")
 
@@ -182,45 +167,36 @@ def create_ai_file(img_array, output_path, num_levels=6):
 
 '''
 
-    for level_idx in range(num_levels):
-        threshold = int(255 * (level_idx + 1) / (num_levels + 1))
-        _, binary = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
-        
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        ai_content += f"\n% Layer {level_idx + 1} (threshold: {threshold})\n"
-        ai_content += f"/layerName (Layer_{level_idx + 1}) def\n"
-        
-        gray_level = 1 - (level_idx / num_levels)
-        ai_content += f"{gray_level} setgray\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        contour_count = 0
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < 10:
-                continue
+        for level_idx, (threshold, contours) in enumerate(_layered_contours(gray, num_levels)):
+            f.write(f"\n% Layer {level_idx + 1} (threshold: {threshold})\n")
+            f.write(f"/layerName (Layer_{level_idx + 1}) def\n")
             
-            contour_count += 1
-            ai_content += "\n% Contour\n"
-            ai_content += "newpath\n"
+            gray_level = 1 - (level_idx / num_levels)
+            f.write(f"{gray_level} setgray\n")
             
-            points = contour.reshape(-1, 2)
-            if len(points) > 0:
-                ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+            contour_count = 0
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area < 10:
+                    continue
+                
+                contour_count += 1
+                points = contour.reshape(-1, 2).tolist()
                 
-                for j in range(1, len(points)):
-                    ai_content += f"{points[j][0]} {height - points[j][1]} lineto\n"
+                body = "".join(f"{x} {height - y} lineto\n" for x, y in points[1:])
+                f.write("\n% Contour\n"
+                        "newpath\n"
+                        f"{points[0][0]} {height - points[0][1]} moveto\n"
+                        f"{body}closepath\n"
+                        "fill\n")
             
-            ai_content += "closepath\n"
-            ai_content += "fill\n"
+            f.write(f"% End of Layer {level_idx + 1} ({contour_count} contours)\n")
         
-        ai_content += f"% End of Layer {level_idx + 1} ({contour_count} contours)\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     print(f"已生成AI文件: {output_path}")
 
@@ -232,9 +208,10 @@ def create_detailed_trace(img_array, output_path):
     blurred = cv2.GaussianBlur(gray, (3, 3), 0)
     
     edges = cv2.Canny(blurred, 50, 150)
-    contours, hierarchy = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    contours, hierarchy = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_TC89_KCOS)
     
-    total_area = sum(cv2.contourArea(c) for c in contours)
+    areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+    total_area = areas.sum()
     
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">
@@ -255,33 +232,52 @@ def create_detailed_trace(img_array, output_path):
   <g id="contours" fill="black" stroke="none">
 '''
 
-    sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)
+    order = np.argsort(-areas, kind="stable")[:500]
     
-    for i, contour in enumerate(sorted_contours[:500]):
-        area = cv2.contourArea(contour)
-        if area < 1:
-            continue
-        
-        opacity = min(1.0, 0.3 + (area / total_area) * 10)
-        
-        svg_content += f'    <path id="c{i}" data-area="{area:.1f}" data-opacity="{opacity:.3f}" d="'
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        points = contour.reshape(-1, 2)
-        if len(points) > 0:
-            svg_content += f"M {points[0][0]} {points[0][1]} "
-            for j in range(1, len(points)):
-                svg_content += f"L {points[j][0]} {points[j][1]} "
-            svg_content += "Z"
+        for i, idx in enumerate(order):
+            area = float(areas[idx])
+            if area < 1:
+                continue
+            
+            contour = contours[idx]
+            opacity = min(1.0, 0.3 + (area / total_area) * 10)
+            
+            points = contour.reshape(-1, 2)
+            
+            body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+            f.write(f'    <path id="c{i}" data-area="{area:.1f}" data-opacity="{opacity:.3f}" '
+                    f'd="M {points[0][0]} {points[0][1]} {body}Z" fill-opacity="{opacity}"/>\n')
         
-        svg_content += f'" fill-opacity="{opacity}"/>\n'
+        f.write('''  </g>
+</svg>''')
     
-    svg_content += '''  </g>
-</svg>'''
+    print(f"已生成详细SVG: {output_path}")
+
+def vectorize_image(image_path):
+    """单张图片转矢量"""
+    print(f"\n[2/4] 处理图片: {image_path}")
+    base_name = os.path.splitext(image_path)[0]
     
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+    img = cv2.imread(image_path)
+    if img is None:
+        print(f"无法读取图片: {image_path}")
+        return
     
-    print(f"已生成详细SVG: {output_path}")
+    print(f"    图片尺寸: {img.shape[1]}x{img.shape[0]}")
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    
+    print("[3/4] 生成矢量图...")
+    contours = image_contours_to_svg(gray, f"{base_name}_contours.svg", threshold=100, min_area=5)
+    print(f"    检测到 {contours} 个轮廓")
+    
+    create_layered_svg(gray, f"{base_name}_layered.svg", num_levels=8)
+    
+    create_ai_file(gray, f"{base_name}.ai", num_levels=6)
+    
+    create_detailed_trace(gray, f"{base_name}_detailed.svg")
 
 def process_pdf_images(pdf_path="a.pdf"):
     """处理PDF中的图片并转换为矢量格式"""
@@ -302,26 +298,13 @@ def process_pdf_images(pdf_path="a.pdf"):
             images = [image_path]
         doc.close()
     
-    for image_path in images:
-        print(f"\n[2/4] 处理图片: {image_path}")
-        base_name = os.path.splitext(image_path)[0]
-        
-        img = cv2.imread(image_path)
-        if img is None:
-            print(f"无法读取图片: {image_path}")
-            continue
-        
-        print(f"    图片尺寸: {img.shape[1]}x{img.shape[0]}")
-        
-        print("[3/4] 生成矢量图...")
-        contours = image_contours_to_svg(img, f"{base_name}_contours.svg", threshold=100, min_area=5)
-        print(f"    检测到 {contours} 个轮廓")
-        
-        create_layered_svg(img, f"{base_name}_layered.svg", num_levels=8)
-        
-        create_ai_file(img, f"{base_name}.ai", num_levels=6)
-        
-        create_detailed_trace(img, f"{base_name}_detailed.svg")
+    workers = min(len(images), os.cpu_count() or 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            list(ex.map(vectorize_image, images))
+    else:
+        for image_path in images:
+            vectorize_image(image_path)
     
     print("\n[4/4] 完成！")
     print("=" * 60)
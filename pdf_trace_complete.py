@@ -1,23 +1,8 @@
-import fitz
 import cv2
 import numpy as np
-from PIL import Image
 import os
-
-def extract_page_as_image(pdf_path, output_path="extracted/page_full.png", dpi=300):
-    """将PDF页面提取为高分辨率图片"""
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    
-    doc.close()
-    print(f"已提取页面: {output_path} ({pixmap.width}x{pixmap.height})")
-    return output_path
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array
 
 def advanced_trace(img):
     """高级矢量描摹 - 提取所有细节"""
@@ -29,11 +14,9 @@ def advanced_trace(img):
     
     edges = cv2.Canny(blurred, 30, 100, apertureSize=3)
     
-    kernel = np.ones((3, 3), np.uint8)
-    edges = cv2.dilate(edges, kernel, iterations=1)
-    edges = cv2.erode(edges, kernel, iterations=1)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
     
-    contours, hierarchy = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
     
     simplified_contours = []
     for contour in contours:
@@ -49,28 +32,38 @@ def contours_to_svg_path(contour):
         return ""
     
     points = contour.reshape(-1, 2)
-    path = f"M {points[0][0]} {points[0][1]}"
+    body = (" L %d %d" * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
     
-    for j in range(1, len(points)):
-        path += f" L {points[j][0]} {points[j][1]}"
-    
-    path += " Z"
-    return path
+    return f"M {points[0][0]} {points[0][1]}{body} Z"
 
-def create_full_trace_svg(img, output_path, simplify=True):
-    """创建完整的矢量描摹SVG"""
-    height, width = img.shape[:2]
+def _edge_contours(img, blur_size, low, high):
+    """模糊 + Canny 后提取轮廓，连同面积和周长按面积从大到小排序"""
+    src = cv2.UMat(img) if cv2.ocl.haveOpenCL() else img
     
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+    gray = cv2.cvtColor(src, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else src
+    blurred = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
     
-    edges = cv2.Canny(blurred, 20, 60, apertureSize=3)
+    edges = cv2.Canny(blurred, low, high, apertureSize=3)
+    edges = edges.get() if isinstance(edges, cv2.UMat) else edges
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_TC89_KCOS)
     
-    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float64, count=len(contours))
+    perims = np.fromiter((cv2.arcLength(c, True) if a >= 2 else 0.0 for c, a in zip(contours, areas)),
+                         dtype=np.float64, count=len(contours))
+    order = np.argsort(-areas, kind="stable")
     
-    total_area = sum(cv2.contourArea(c) for c in contours)
+    return [contours[i] for i in order], areas[order], perims[order]
+
+def create_full_trace_svg(img, output_path, simplify=True, traced=None):
+    """创建完整的矢量描摹SVG"""
+    height, width = img.shape[:2]
     
-    contours_sorted = sorted(contours, key=cv2.contourArea, reverse=True)
+    if traced is None:
+        traced = _edge_contours(img, 3, 20, 60)
+    contours_sorted, areas, perims = traced
+    
+    total_area = areas.sum()
+    opacities = np.minimum(1.0, 0.1 + (areas / (total_area or 1)) * 5)
     
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" xmlns:ai="http://ns.adobe.com/AdobeIllustrator/10.0/"
@@ -86,8 +79,8 @@ def create_full_trace_svg(img, output_path, simplify=True):
       </cc:Work>
     </rdf:RDF>
   </metadata>
-  <title>Complete Vector Trace - {len(contours)} contours</title>
-  <desc>Original: {width}x{height}, Contours: {len(contours)}, Total Area: {total_area:.0f}px</desc>
+  <title>Complete Vector Trace - {len(contours_sorted)} contours</title>
+  <desc>Original: {width}x{height}, Contours: {len(contours_sorted)}, Total Area: {total_area:.0f}px</desc>
   
   <!-- Background -->
   <rect width="100%" height="100%" fill="white"/>
@@ -96,50 +89,50 @@ def create_full_trace_svg(img, output_path, simplify=True):
   <g id="all_paths" fill="black" stroke="none">
 '''
     
-    for i, contour in enumerate(contours_sorted):
-        area = cv2.contourArea(contour)
-        if area < 2:
-            continue
-        
-        if simplify:
-            epsilon = 0.005 * cv2.arcLength(contour, True)
-            contour = cv2.approxPolyDP(contour, epsilon, True)
-        
-        path_data = contours_to_svg_path(contour)
-        if not path_data:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        opacity = min(1.0, 0.1 + (area / total_area) * 5)
+        for i, contour in enumerate(contours_sorted):
+            area = areas[i]
+            if area < 2:
+                continue
+            
+            if simplify:
+                epsilon = 0.005 * perims[i]
+                contour = cv2.approxPolyDP(contour, epsilon, True)
+            
+            path_data = contours_to_svg_path(contour)
+            if not path_data:
+                continue
+            
+            f.write(f'    <path id="path_{i}" data-area="{area:.1f}" data-order="{i}" ')
+            f.write(f'fill-opacity="{opacities[i]:.3f}" d="{path_data}"/>\n')
         
-        svg_content += f'    <path id="path_{i}" data-area="{area:.1f}" data-order="{i}" '
-        svg_content += f'fill-opacity="{opacity:.3f}" d="{path_data}"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     print(f"已生成完整描摹SVG: {output_path}")
-    return len(contours)
+    return len(contours_sorted)
+
+def _canny_contours(blurred, threshold):
+    """单个阈值的 Canny 边缘及其轮廓"""
+    edges = cv2.Canny(blurred, threshold * 0.5, threshold)
+    
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_TC89_KCOS)
+    return contours
 
 def create_multi_layer_svg(img, output_path, num_layers=16):
     """创建多层次的详细描摹SVG"""
     height, width = img.shape[:2]
     
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    else:
-        gray = img.copy()
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
     
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    blurred = cv2.GaussianBlur(cv2.UMat(gray) if cv2.ocl.haveOpenCL() else gray, (5, 5), 0)
+    blurred = blurred.get() if isinstance(blurred, cv2.UMat) else blurred
     
-    edges_layers = []
-    for threshold in [20, 40, 60, 80, 100, 120, 150, 180]:
-        edges = cv2.Canny(blurred, threshold * 0.5, threshold)
-        edges_layers.append(edges)
+    thresholds = [20, 40, 60, 80, 100, 120, 150, 180]
+    with ThreadPoolExecutor(max_workers=len(thresholds)) as ex:
+        contour_layers = list(ex.map(_canny_contours, [blurred] * len(thresholds), thresholds))
     
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">
@@ -149,79 +142,62 @@ def create_multi_layer_svg(img, output_path, num_layers=16):
       .layer {{ fill: none; stroke: black; }}
 '''
     
-    colors = ['#000000', '#111111', '#222222', '#333333', '#444444', '#555555', '#666666', '#777777',
-              '#888888', '#999999', '#AAAAAA', '#BBBBBB', '#CCCCCC', '#DDDDDD', '#EEEEEE', '#FFFFFF']
-    
-    for i in range(num_layers):
-        svg_content += f'      .l{i} {{ stroke: {colors[i % len(colors)]}; stroke-width: {0.5 + i*0.1}; }}\n'
-        svg_content += f'      .lf{i} {{ fill: {colors[i % len(colors)]}; fill-opacity: 0.3; stroke: none; }}\n'
-    
-    svg_content += '''    </style>
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
+        
+        colors = ['#000000', '#111111', '#222222', '#333333', '#444444', '#555555', '#666666', '#777777',
+                  '#888888', '#999999', '#AAAAAA', '#BBBBBB', '#CCCCCC', '#DDDDDD', '#EEEEEE', '#FFFFFF']
+        
+        for i in range(num_layers):
+            f.write(f'      .l{i} {{ stroke: {colors[i % len(colors)]}; stroke-width: {0.5 + i*0.1}; }}\n')
+            f.write(f'      .lf{i} {{ fill: {colors[i % len(colors)]}; fill-opacity: 0.3; stroke: none; }}\n')
+        
+        f.write('''    </style>
   </defs>
   
   <rect width="100%" height="100%" fill="white"/>
   
   <!-- Combined edges as paths -->
   <g id="edges_combined">
-'''
-    
-    for layer_idx, edges in enumerate(edges_layers):
-        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-        
-        svg_content += f'    <g id="edge_layer_{layer_idx}" class="layer l{layer_idx % num_layers}">\n'
+''')
         
-        contour_count = 0
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if area < 5:
-                continue
+        for layer_idx, contours in enumerate(contour_layers):
+            f.write(f'    <g id="edge_layer_{layer_idx}" class="layer l{layer_idx % num_layers}">\n')
             
-            contour_count += 1
+            contour_count = 0
+            for contour in contours:
+                area = cv2.contourArea(contour)
+                if area < 5:
+                    continue
+                
+                contour_count += 1
+                
+                path_data = contours_to_svg_path(contour)
+                if not path_data:
+                    continue
+                
+                f.write(f'      <path id="e{layer_idx}_{contour_count}" d="{path_data}"/>\n')
             
-            if simplify_contour(contour, area) is None:
-                continue
-            
-            path_data = contours_to_svg_path(contour)
-            if not path_data:
-                continue
-            
-            svg_content += f'      <path id="e{layer_idx}_{contour_count}" d="{path_data}"/>\n'
+            f.write(f'    </g>\n')
         
-        svg_content += f'    </g>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     print(f"已生成多层SVG: {output_path}")
 
-def simplify_contour(contour, area, factor=0.01):
-    """简化轮廓"""
-    if area < 10:
-        return contour
-    try:
-        epsilon = factor * cv2.arcLength(contour, True)
-        return cv2.approxPolyDP(contour, epsilon, True)
-    except:
-        return contour
-
-def create_complete_ai(img, output_path):
+def create_complete_ai(img, output_path, traced=None):
     """创建完整的Adobe Illustrator兼容文件"""
     height, width = img.shape[:2]
     
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
-    
-    edges = cv2.Canny(blurred, 20, 60)
-    contours, hierarchy = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-    
-    contours_sorted = sorted(contours, key=cv2.contourArea, reverse=True)
+    if traced is None:
+        traced = _edge_contours(img, 3, 20, 60)
+    contours_sorted, areas, perims = traced
     
     total_contours = len(contours_sorted)
     print(f"检测到 {total_contours} 个轮廓")
     
+    gray_levels = np.clip((255 * (1 - areas / (width * height) * 100)).astype(int), 0, 255) / 255
+    
     ai_content = f'''%!AI-Adobe_Illustrator-3.0
 %%Creator: Python Vector Tracer
 %%Title: {os.path.basename(output_path)}
@@ -241,75 +217,67 @@ def create_complete_ai(img, output_path):
 
 '''
 
-    ai_content += f"% AI_File = {output_path}\n"
-    ai_content += f"% Contours = {total_contours}\n\n"
-    
-    ai_content += '''% Inner path data structure
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
+        
+        f.write(f"% AI_File = {output_path}\n")
+        f.write(f"% Contours = {total_contours}\n\n")
+        
+        f.write('''% Inner path data structure
 /internaldict 256 dict def
 internaldict begin
   /contours 0 def
 end
 
-'''
-
-    contour_id = 0
-    
-    for i, contour in enumerate(contours_sorted):
-        area = cv2.contourArea(contour)
-        if area < 2:
-            continue
-        
-        try:
-            epsilon = 0.003 * cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, epsilon, True)
-        except:
-            approx = contour
-        
-        points = approx.reshape(-1, 2)
-        if len(points) < 3:
-            continue
-        
-        contour_id += 1
+''')
         
-        gray_value = int(255 * (1 - area / (width * height) * 100))
-        gray_value = max(0, min(255, gray_value))
+        contour_id = 0
         
-        ai_content += f"\n% Contour {contour_id} - Area: {area:.1f}\n"
-        ai_content += f"% Bounds: {points[:,0].min()}-{points[:,0].max()} x {points[:,1].min()}-{points[:,1].max()}\n"
-        ai_content += "newpath\n"
-        
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-        
-        for j in range(1, len(points)):
-            x, y = points[j]
-            px, py = points[j-1]
+        for i, contour in enumerate(contours_sorted):
+            area = areas[i]
+            if area < 2:
+                continue
+            
+            try:
+                epsilon = 0.003 * perims[i]
+                approx = cv2.approxPolyDP(contour, epsilon, True)
+            except:
+                approx = contour
+            
+            points = approx.reshape(-1, 2)
+            if len(points) < 3:
+                continue
+            
+            contour_id += 1
+            
+            flipped = points.copy()
+            flipped[:, 1] = height - flipped[:, 1]
             
-            dx = x - px
-            dy = y - py
+            f.write(f"\n% Contour {contour_id} - Area: {area:.1f}\n")
+            f.write(f"% Bounds: {points[:,0].min()}-{points[:,0].max()} x {points[:,1].min()}-{points[:,1].max()}\n")
+            f.write("newpath\n")
             
-            if abs(dx) > 50 or abs(dy) > 50:
-                ai_content += f"{x} {height - y} moveto\n"
+            f.write(f"{flipped[0][0]} {flipped[0][1]} moveto\n")
+            
+            jump = (np.abs(np.diff(flipped, axis=0)) > 50).any(axis=1)
+            ops = np.where(jump, "%d %d moveto\n", "%d %d lineto\n")
+            f.write("".join(ops.tolist()) % tuple(flipped[1:].ravel().tolist()))
+            
+            f.write("closepath\n")
+            
+            if area > 1000:
+                f.write(f"{gray_levels[i]} setgray\n")
+                f.write("fill\n")
             else:
-                ai_content += f"{x} {height - y} lineto\n"
-        
-        ai_content += "closepath\n"
-        
-        if area > 1000:
-            ai_content += f"{gray_value / 255} setgray\n"
-            ai_content += "fill\n"
-        else:
-            ai_content += f"{gray_value / 255} setgray\n"
-            ai_content += "0.5 setlinewidth\n"
-            ai_content += "stroke\n"
+                f.write(f"{gray_levels[i]} setgray\n")
+                f.write("0.5 setlinewidth\n")
+                f.write("stroke\n")
+            
+            if contour_id % 100 == 0:
+                print(f"  已处理 {contour_id}/{total_contours} 个轮廓...")
         
-        if contour_id % 100 == 0:
-            print(f"  已处理 {contour_id}/{total_contours} 个轮廓...")
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     print(f"已生成完整AI文件: {output_path}")
 
@@ -317,19 +285,15 @@ def create_trace_with_fills(img, output_path):
     """创建带有填充区域的完整描摹（适合图像描摹效果）"""
     height, width = img.shape[:2]
     
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    else:
-        gray = img.copy()
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
     
     blurred = cv2.GaussianBlur(gray, (7, 7), 0)
     
     _, binary = cv2.threshold(blurred, 127, 255, cv2.THRESH_BINARY)
     
-    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_TC89_KCOS)
     
-    contours_internal, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    contours_internal, _ = cv2.findContours(binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_TC89_KCOS)
     
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg" xmlns:ai="http://ns.adobe.com/AdobeIllustrator/10.0/"
@@ -359,52 +323,52 @@ def create_trace_with_fills(img, output_path):
   <g id="fills" fill="black" stroke="none">
 '''
 
-    for i, contour in enumerate(contours):
-        area = cv2.contourArea(contour)
-        if area < 20:
-            continue
-        
-        try:
-            epsilon = 0.005 * cv2.arcLength(contour, True)
-            approx = cv2.approxPolyDP(contour, epsilon, True)
-        except:
-            approx = contour
-        
-        points = approx.reshape(-1, 2)
-        if len(points) < 3:
-            continue
-        
-        path_data = contours_to_svg_path(contour)
-        if not path_data:
-            continue
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        x, y, w, h = cv2.boundingRect(contour)
-        aspect_ratio = w / h if h > 0 else 1
+        for i, contour in enumerate(contours):
+            area = cv2.contourArea(contour)
+            if area < 20:
+                continue
+            
+            try:
+                epsilon = 0.005 * cv2.arcLength(contour, True)
+                approx = cv2.approxPolyDP(contour, epsilon, True)
+            except:
+                approx = contour
+            
+            points = approx.reshape(-1, 2)
+            if len(points) < 3:
+                continue
+            
+            path_data = contours_to_svg_path(contour)
+            if not path_data:
+                continue
+            
+            x, y, w, h = cv2.boundingRect(contour)
+            aspect_ratio = w / h if h > 0 else 1
+            
+            f.write(f'    <path id="fill_{i}" data-area="{area}" data-aspect="{aspect_ratio:.2f}" d="{path_data}"/>\n')
         
-        svg_content += f'    <path id="fill_{i}" data-area="{area}" data-aspect="{aspect_ratio:.2f}" d="{path_data}"/>\n'
-    
-    svg_content += '''  </g>
+        f.write('''  </g>
   
   <!-- Group for stroke edges -->
   <g id="edges" fill="none" stroke="#333333" stroke-width="0.5">
-'''
-
-    for i, contour in enumerate(contours_internal[:len(contours)]):
-        area = cv2.contourArea(contour)
-        if area < 5:
-            continue
+''')
         
-        path_data = contours_to_svg_path(contour)
-        if not path_data:
-            continue
+        for i, contour in enumerate(contours_internal[:len(contours)]):
+            area = cv2.contourArea(contour)
+            if area < 5:
+                continue
+            
+            path_data = contours_to_svg_path(contour)
+            if not path_data:
+                continue
+            
+            f.write(f'    <path id="edge_{i}" d="{path_data}"/>\n')
         
-        svg_content += f'    <path id="edge_{i}" d="{path_data}"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
     
     print(f"已生成填充描摹SVG: {output_path}")
 
@@ -412,13 +376,7 @@ def create_ai_with_groups(img, output_path, num_groups=8):
     """创建带有分组信息的Adobe Illustrator文件"""
     height, width = img.shape[:2]
     
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-    
-    edges = cv2.Canny(blurred, 30, 90)
-    all_contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-    
-    contours_sorted = sorted(all_contours, key=cv2.contourArea, reverse=True)
+    contours_sorted, areas, perims = _edge_contours(img, 5, 30, 90)
     
     group_size = max(1, len(contours_sorted) // num_groups)
     
@@ -443,63 +401,63 @@ def create_ai_with_groups(img, output_path, num_groups=8):
 
 '''
 
-    for group_idx in range(num_groups):
-        start_idx = group_idx * group_size
-        end_idx = min((group_idx + 1) * group_size, len(contours_sorted))
-        
-        if start_idx >= len(contours_sorted):
-            break
-        
-        gray_level = 1 - (group_idx / num_groups)
-        
-        ai_content += f"\n% ================================ GROUP {group_idx + 1} ================================\n"
-        ai_content += f"% Contours {start_idx + 1} to {end_idx}\n"
-        ai_content += f"/layerName (Group_{group_idx + 1}) def\n"
-        ai_content += f"{gray_level} setgray\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        group_contour_count = 0
-        for i in range(start_idx, end_idx):
-            contour = contours_sorted[i]
-            area = cv2.contourArea(contour)
+        for group_idx in range(num_groups):
+            start_idx = group_idx * group_size
+            end_idx = min((group_idx + 1) * group_size, len(contours_sorted))
             
-            if area < 5:
-                continue
+            if start_idx >= len(contours_sorted):
+                break
             
-            try:
-                epsilon = 0.004 * cv2.arcLength(contour, True)
-                approx = cv2.approxPolyDP(contour, epsilon, True)
-            except:
-                approx = contour
+            gray_level = 1 - (group_idx / num_groups)
             
-            points = approx.reshape(-1, 2)
-            if len(points) < 3:
-                continue
+            f.write(f"\n% ================================ GROUP {group_idx + 1} ================================\n")
+            f.write(f"% Contours {start_idx + 1} to {end_idx}\n")
+            f.write(f"/layerName (Group_{group_idx + 1}) def\n")
+            f.write(f"{gray_level} setgray\n")
             
-            group_contour_count += 1
+            group_contour_count = 0
+            for i in range(start_idx, end_idx):
+                contour = contours_sorted[i]
+                area = areas[i]
+                
+                if area < 5:
+                    continue
+                
+                try:
+                    epsilon = 0.004 * perims[i]
+                    approx = cv2.approxPolyDP(contour, epsilon, True)
+                except:
+                    approx = contour
+                
+                points = approx.reshape(-1, 2)
+                if len(points) < 3:
+                    continue
+                
+                group_contour_count += 1
+                
+                flipped = points.copy()
+                flipped[:, 1] = height - flipped[:, 1]
+                
+                f.write(f"\n% Contour {i + 1} (Group {group_idx + 1})\n")
+                f.write("newpath\n")
+                
+                f.write(f"{flipped[0][0]} {flipped[0][1]} moveto\n")
+                f.write(("%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist()))
+                
+                f.write("closepath\n")
+                
+                if area > 100:
+                    f.write("fill\n")
+                else:
+                    f.write("0.3 setlinewidth\nstroke\n")
             
-            ai_content += f"\n% Contour {i + 1} (Group {group_idx + 1})\n"
-            ai_content += "newpath\n"
-            
-            ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-            
-            for j in range(1, len(points)):
-                x, y = points[j]
-                ai_content += f"{x} {height - y} lineto\n"
-            
-            ai_content += "closepath\n"
-            
-            if area > 100:
-                ai_content += "fill\n"
-            else:
-                ai_content += "0.3 setlinewidth\nstroke\n"
+            f.write(f"% End Group {group_idx + 1} ({group_contour_count} contours)\n")
         
-        ai_content += f"% End Group {group_idx + 1} ({group_contour_count} contours)\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     print(f"已生成分组AI文件: {output_path}")
     return len(contours_sorted)
@@ -511,30 +469,29 @@ def process_pdf_complete(pdf_path="a.pdf"):
     print("=" * 70)
     
     print("\n[1/6] 提取PDF页面为高分辨率图片...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/6] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print(f"无法读取图片: {image_path}")
-        return
     
     print(f"    图片尺寸: {img.shape[1]}x{img.shape[0]}")
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    
+    base_name = "extracted/page_full"
     
-    base_name = os.path.splitext(image_path)[0]
+    traced = _edge_contours(gray, 3, 20, 60)
     
     print("\n[3/6] 生成完整描摹SVG...")
-    create_full_trace_svg(img, f"{base_name}_complete.svg")
+    create_full_trace_svg(gray, f"{base_name}_complete.svg", traced=traced)
     
     print("\n[4/6] 生成分层SVG...")
-    create_multi_layer_svg(img, f"{base_name}_multilayer.svg", num_layers=12)
+    create_multi_layer_svg(gray, f"{base_name}_multilayer.svg", num_layers=12)
     
     print("\n[5/6] 生成Adobe Illustrator格式...")
-    create_complete_ai(img, f"{base_name}_complete.ai")
+    create_complete_ai(gray, f"{base_name}_complete.ai", traced=traced)
     
-    create_trace_with_fills(img, f"{base_name}_with_fills.svg")
+    create_trace_with_fills(gray, f"{base_name}_with_fills.svg")
     
-    total_contours = create_ai_with_groups(img, f"{base_name}_grouped.ai", num_groups=12)
+    total_contours = create_ai_with_groups(gray, f"{base_name}_grouped.ai", num_groups=12)
     
     print("\n[6/6] 完成！")
     print("=" * 70)
@@ -0,0 +1,31 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from _render_cache import get_page_array, blur_gray
+from smooth_bspline import process_smooth_curves
+from smooth_continuous import process_lines
+from solid_lines import process_for_printing
+from very_smooth import process_smooth
+from solid_smooth_lines import process_solid_lines
+from trace_lines import process_pdf_lines
+
+def run_all(pdf_path="a.pdf"):
+    """在独立进程中同时运行B样条、平滑线条和实体单线三种处理"""
+    get_page_array(pdf_path, dpi=300)
+    
+    jobs = [process_smooth_curves, process_lines, process_for_printing]
+    with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as ex:
+        futures = [ex.submit(job, pdf_path) for job in jobs]
+        for future in futures:
+            future.result()
+
+def process_all(pdf_path="a.pdf", line_width=4):
+    """在同一进程中依次运行多重平滑、实心平滑和黑色线条描摹，共用同一页面图像"""
+    img = get_page_array(pdf_path, dpi=200)
+    blurred = blur_gray(img)
+    
+    process_smooth(pdf_path, img, blurred)
+    process_solid_lines(pdf_path, line_width, img, blurred)
+    process_pdf_lines(pdf_path)
+
+if __name__ == "__main__":
+    run_all("a.pdf")
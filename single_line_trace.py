@@ -30,21 +30,12 @@ def get_skeleton(img):
     binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
     
     skeleton = np.zeros(binary.shape, np.uint8)
-    
-    size = np.size(binary)
     element = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
     
-    done = False
-    while not done:
+    while cv2.countNonZero(binary):
         eroded = cv2.erode(binary, element)
-        temp = cv2.dilate(eroded, element)
-        temp = cv2.subtract(binary, temp)
-        skeleton = cv2.bitwise_or(skeleton, temp)
-        binary = eroded.copy()
-        
-        zeros = size - cv2.countNonZero(binary)
-        if zeros == size:
-            done = True
+        cv2.bitwise_or(skeleton, cv2.subtract(binary, cv2.dilate(eroded, element)), dst=skeleton)
+        binary = eroded
     
     kernel2 = np.ones((2, 2), np.uint8)
     skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, kernel2)
@@ -68,26 +59,25 @@ def skeleton_to_svg(skeleton, output_path, width, height):
   <g id="lines" stroke="black" fill="none" stroke-width="1">
 '''
     
-    for i, contour in enumerate(contours):
-        points = contour.reshape(-1, 2)
-        if len(points) < 2:
-            continue
-        
-        if len(points) == 2:
-            svg_content += f'    <line id="l{i}" x1="{points[0][0]}" y1="{points[0][1]}" '
-            svg_content += f'x2="{points[1][0]}" y2="{points[1][1]}"/>\n'
-        else:
-            svg_content += f'    <path id="p{i}" d="'
-            svg_content += f"M {points[0][0]} {points[0][1]} "
-            for j in range(1, len(points)):
-                svg_content += f"L {points[j][0]} {points[j][1]} "
-            svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        
+        for i, contour in enumerate(contours):
+            points = contour.reshape(-1, 2)
+            if len(points) < 2:
+                continue
+            
+            if len(points) == 2:
+                f.write(f'    <line id="l{i}" x1="{points[0][0]}" y1="{points[0][1]}" ')
+                f.write(f'x2="{points[1][0]}" y2="{points[1][1]}"/>\n')
+            else:
+                f.write(f'    <path id="p{i}" d="')
+                f.write(f"M {points[0][0]} {points[0][1]} ")
+                f.write(("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist()))
+                f.write('"/>\n')
+        
+        f.write('''  </g>
+</svg>''')
     
     return len(contours), total_points
 
@@ -114,27 +104,27 @@ def skeleton_to_ai(skeleton, output_path, width, height):
 
 '''
     
-    for i, contour in enumerate(contours):
-        points = contour.reshape(-1, 2)
-        if len(points) < 2:
-            continue
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+        for i, contour in enumerate(contours):
+            points = contour.reshape(-1, 2)
+            if len(points) < 2:
+                continue
+            
+            flipped = points.copy()
+            flipped[:, 1] = height - flipped[:, 1]
+            
+            f.write(f"\n% Path {i + 1} ({len(flipped)} points)\n")
+            f.write("newpath\n")
+            f.write(f"{flipped[0][0]} {flipped[0][1]} moveto\n")
+            f.write(("%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist()))
+            
+            f.write("closepath\n")
+            f.write("stroke\n")
         
-        ai_content += "closepath\n"
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     return len(contours)
 
@@ -1,18 +1,16 @@
-import fitz
 import cv2
 import numpy as np
 import os
 from scipy.interpolate import splprep, splev
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array
+from _vector_io import svg_path_elements, ai_path_blocks
+from _trace import trace_skeleton_paths
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+EDGE_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (21, 21))
+EDGE_ERODE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+EDGE_DILATE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (13, 13))
+SKELETON_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (10, 10))
 
 def get_smooth_edges(img):
     """获取平滑的边缘"""
@@ -25,13 +23,10 @@ def get_smooth_edges(img):
     
     edges = cv2.Canny(blurred, 30, 100, apertureSize=3)
     
-    kernel = np.ones((6, 6), np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel, iterations=4)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, EDGE_CLOSE_KERNEL, anchor=(12, 12))
     
-    kernel2 = np.ones((4, 4), np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_OPEN, kernel2, iterations=2)
-    
-    edges = cv2.dilate(edges, kernel2, iterations=2)
+    edges = cv2.erode(edges, EDGE_ERODE_KERNEL, anchor=(4, 4))
+    edges = cv2.dilate(edges, EDGE_DILATE_KERNEL, anchor=(8, 8))
     
     return edges
 
@@ -39,52 +34,21 @@ def get_centerline(edges):
     """获取中心线"""
     edges = np.uint8(edges)
     
+    if hasattr(cv2, "ximgproc"):
+        return cv2.ximgproc.thinning(edges, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+    
     dist = cv2.distanceTransform(edges, cv2.DIST_L2, 5)
     
     _, skeleton = cv2.threshold(dist, 0.3, 255, cv2.THRESH_BINARY)
     skeleton = np.uint8(skeleton)
     
-    kernel = np.ones((4, 4), np.uint8)
-    skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, kernel, iterations=3)
+    skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, SKELETON_CLOSE_KERNEL, anchor=(6, 6))
     
     return skeleton
 
 def extract_long_paths(skeleton, min_length=150):
     """提取长路径"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    height, width = skeleton.shape
-    
-    paths = []
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            queue = [(x, y)]
-            visited[y, x] = 255
-            
-            idx = 0
-            while idx < len(queue):
-                cx, cy = queue[idx]
-                idx += 1
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                queue.append((nx, ny))
-            
-            if len(points) >= min_length:
-                paths.append(np.array(points))
-    
-    return paths
+    return trace_skeleton_paths(skeleton, min_length)
 
 def fit_smooth_curve(points, smoothing=100):
     """B样条平滑曲线"""
@@ -121,30 +85,42 @@ def simplify_with_epsilon(points, epsilon=5):
     if len(points) < 3:
         return points
     
-    simplified = [points[0]]
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
     
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= epsilon:
-            simplified.append(points[i])
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + epsilon))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
     
-    return np.array(simplified)
+    return pts[keep]
 
-def process_smooth_curves(pdf_path="a.pdf"):
+def _smooth_one(path):
+    """单条路径的B样条平滑与简化，过短时返回 None"""
+    if len(path) < 10:
+        return None
+    
+    smoothed = fit_smooth_curve(path, smoothing=len(path) * 2)
+    if len(smoothed) > 5:
+        simplified = simplify_with_epsilon(smoothed, epsilon=8)
+        if len(simplified) > 5:
+            return simplified
+    
+    return None
+
+def process_smooth_curves(pdf_path="a.pdf", scale=2):
     """处理平滑曲线"""
     print("=" * 60)
     print("PDF 平滑曲线处理 (B样条平滑)")
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/5] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
@@ -153,23 +129,17 @@ def process_smooth_curves(pdf_path="a.pdf"):
     edges = get_smooth_edges(img)
     
     print("    获取中心线...")
-    skeleton = get_centerline(edges)
+    small = cv2.resize(edges, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_NEAREST)
+    skeleton = get_centerline(small)
     
     print("    提取路径...")
-    raw_paths = extract_long_paths(skeleton, min_length=120)
+    raw_paths = extract_long_paths(skeleton, min_length=120 // scale)
+    raw_paths = [p * scale for p in raw_paths]
     print(f"    原始路径: {len(raw_paths)} 条")
     
     print("\n[4/5] B样条平滑...")
-    smoothed_paths = []
-    for path in raw_paths:
-        if len(path) < 10:
-            continue
-        
-        smoothed = fit_smooth_curve(path, smoothing=len(path) * 2)
-        if len(smoothed) > 5:
-            simplified = simplify_with_epsilon(smoothed, epsilon=8)
-            if len(simplified) > 5:
-                smoothed_paths.append(simplified)
+    with ThreadPoolExecutor() as ex:
+        smoothed_paths = [p for p in ex.map(_smooth_one, raw_paths) if p is not None]
     
     print(f"    平滑后: {len(smoothed_paths)} 条")
     
@@ -208,23 +178,11 @@ def output_svg(paths, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        f.writelines(svg_path_elements(paths))
+        f.write('''  </g>
+</svg>''')
     
     print(f"    SVG: {len(paths)} 条, {total_points} 点")
 
@@ -248,27 +206,11 @@ def output_ai(paths, output_path, width, height):
 
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-        
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
-        
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(ai_content)
+        f.writelines(ai_path_blocks(paths, height))
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     print(f"    AI: {len(paths)} 条")
 
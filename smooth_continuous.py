@@ -1,17 +1,12 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array
+from _vector_io import svg_path_elements, ai_path_blocks
+from _trace import trace_skeleton_paths
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=200):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+LINE_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
 
 def extract_and_smooth_lines(img, line_width=4):
     """提取并平滑线条"""
@@ -31,79 +26,65 @@ def extract_and_smooth_lines(img, line_width=4):
     
     smoothed = cv2.GaussianBlur(dilated, (5, 5), 1)
     
-    kernel2 = np.ones((3, 3), np.uint8)
-    smoothed = cv2.morphologyEx(smoothed, cv2.MORPH_CLOSE, kernel2, iterations=2)
+    smoothed = cv2.morphologyEx(smoothed, cv2.MORPH_CLOSE, LINE_CLOSE_KERNEL)
     
     return smoothed
 
 def trace_skeleton(skeleton):
     """追踪骨架"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    paths = []
-    height, width = skeleton.shape
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) > 50:
-                paths.append(np.array(points))
-    
-    return paths
+    return trace_skeleton_paths(skeleton, min_length=51)
 
 def smooth_path(points, window=7):
     """移动平均平滑"""
     if len(points) < window:
         return points
     
-    smoothed = []
+    pts = np.asarray(points, dtype=np.float64)
+    n = len(pts)
     half = window // 2
     
-    for i in range(len(points)):
-        start = max(0, i - half)
-        end = min(len(points), i + half + 1)
-        
-        window_pts = points[start:end]
-        
-        avg_x = int(np.mean([p[0] for p in window_pts]))
-        avg_y = int(np.mean([p[1] for p in window_pts]))
-        
-        smoothed.append((avg_x, avg_y))
-    
-    return np.array(smoothed)
+    cs = np.cumsum(np.pad(pts, ((1, 0), (0, 0))), axis=0)
+    idx = np.arange(n)
+    starts = np.clip(idx - half, 0, n)
+    ends = np.clip(idx + half + 1, 0, n)
+    
+    sums = cs[ends] - cs[starts]
+    counts = (ends - starts)[:, None]
+    
+    return (sums / counts).astype(int)
 
 def simplify_path(points, tolerance=5):
     """简化路径"""
     if len(points) < 3:
         return points
     
-    simplified = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= tolerance:
-            simplified.append(points[i])
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + tolerance))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
+    
+    return pts[keep]
+
+def _optimize_one(path):
+    """单条路径的平滑与简化，过短时返回 None"""
+    if len(path) < 20:
+        return None
+    
+    smoothed_path = smooth_path(path, window=7)
+    if len(smoothed_path) < 15:
+        return None
+    
+    simplified = simplify_path(smoothed_path, tolerance=4)
+    if len(simplified) > 5:
+        return simplified
     
-    return np.array(simplified)
+    return None
 
 def process_lines(pdf_path="a.pdf", line_width=4):
     """处理线条"""
@@ -113,13 +94,9 @@ def process_lines(pdf_path="a.pdf", line_width=4):
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=200)
+    img = get_page_array(pdf_path, dpi=200)
     
     print("\n[2/5] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
@@ -132,18 +109,8 @@ def process_lines(pdf_path="a.pdf", line_width=4):
     print(f"    原始路径: {len(paths)} 条")
     
     print("\n[4/5] 优化路径...")
-    optimized = []
-    for path in paths:
-        if len(path) < 20:
-            continue
-        
-        smoothed_path = smooth_path(path, window=7)
-        if len(smoothed_path) < 15:
-            continue
-        
-        simplified = simplify_path(smoothed_path, tolerance=4)
-        if len(simplified) > 5:
-            optimized.append(simplified)
+    with ThreadPoolExecutor() as ex:
+        optimized = [p for p in ex.map(_optimize_one, paths) if p is not None]
     
     print(f"    优化后: {len(optimized)} 条")
     
@@ -182,23 +149,11 @@ def output_svg(paths, output_path, width, height, line_width):
   <g id="lines" stroke="black" fill="none" stroke-width="{line_width}" stroke-linecap="round" stroke-linejoin="round">
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        f.writelines(svg_path_elements(paths))
+        f.write('''  </g>
+</svg>''')
     
     print(f"    SVG: {len(paths)} 条, {total_points} 点")
 
@@ -226,27 +181,11 @@ def output_ai(paths, output_path, width, height, line_width):
 '''
     height = int(height)
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-        
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
-        
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(ai_content)
+        f.writelines(ai_path_blocks(paths, height))
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     print(f"    AI: {len(paths)} 条")
 
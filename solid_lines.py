@@ -1,24 +1,20 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from _render_cache import get_page_array
+from _vector_io import svg_path_elements, ai_path_blocks
+from _trace import trace_skeleton_paths
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+THINNING_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+BINARY_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (11, 11))
+BINARY_OPEN_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+SKELETON_ERODE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
 
 def adaptive_thinning(binary):
     """自适应骨架化"""
     binary = np.uint8(binary)
     
-    kernel = np.ones((3, 3), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=4)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, THINNING_CLOSE_KERNEL)
     
     dist = cv2.distanceTransform(binary, cv2.DIST_L1, 3)
     
@@ -38,14 +34,16 @@ def trace_center_lines(img):
     
     _, binary = cv2.threshold(gray, 45, 255, cv2.THRESH_BINARY_INV)
     
-    kernel = np.ones((3, 3), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=5)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel, iterations=2)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, BINARY_CLOSE_KERNEL)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, BINARY_OPEN_KERNEL)
+    
+    if hasattr(cv2, "ximgproc"):
+        skeleton = cv2.ximgproc.thinning(binary, thinningType=cv2.ximgproc.THINNING_ZHANGSUEN)
+        return skeleton, binary
     
     _, skeleton = cv2.threshold(binary, 127, 1, cv2.THRESH_BINARY)
     
-    kernel2 = np.ones((2, 2), np.uint8)
-    skeleton = cv2.erode(skeleton, kernel2, iterations=1)
+    skeleton = cv2.erode(skeleton, SKELETON_ERODE_KERNEL, iterations=1)
     skeleton = np.uint8(skeleton) * 255
     
     return skeleton, binary
@@ -58,73 +56,36 @@ def lines_to_vector_lines(skeleton, width, height):
     if lines is None:
         return []
     
-    vector_lines = []
-    for line in lines:
-        x1, y1, x2, y2 = line[0]
-        length = np.sqrt((x2-x1)**2 + (y2-y1)**2)
-        if length > 5:
-            vector_lines.append((x1, y1, x2, y2))
+    lines = lines.reshape(-1, 4)
+    dx = lines[:, 2] - lines[:, 0]
+    dy = lines[:, 3] - lines[:, 1]
     
-    return vector_lines
+    return lines[dx * dx + dy * dy > 25].tolist()
 
 def lines_to_contours(skeleton, width, height):
     """骨架转为连续轮廓"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    contours = []
-    
-    height_s, width_s = skeleton.shape
-    
-    for y in range(height_s):
-        for x in range(width_s):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = [(x, y)]
-            visited[y, x] = 255
-            
-            queue = [(x, y)]
-            idx = 0
-            
-            while idx < len(queue):
-                cx, cy = queue[idx]
-                idx += 1
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width_s and 0 <= ny < height_s:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                points.append((nx, ny))
-                                queue.append((nx, ny))
-            
-            if len(points) > 3:
-                contours.append(np.array(points))
-    
-    return contours
+    return trace_skeleton_paths(skeleton, min_length=4)
 
 def simplify_contour(points, tolerance=2):
     """简化轮廓点"""
     if len(points) <= 2:
         return points
     
-    simplified = [points[0]]
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
     
-    for i in range(1, len(points)):
-        last = simplified[-1]
-        curr = points[i]
-        dist = np.sqrt((curr[0] - last[0])**2 + (curr[1] - last[1])**2)
-        if dist >= tolerance:
-            simplified.append(curr)
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + tolerance))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
     
-    if len(simplified) > 2 and np.sqrt((simplified[-1][0] - simplified[0][0])**2 + 
-                                        (simplified[-1][1] - simplified[0][1])**2) < tolerance:
-        simplified.pop()
+    if len(keep) > 2 and np.hypot(*(pts[keep[-1]] - pts[0])) < tolerance:
+        keep.pop()
     
-    return simplified
+    return pts[keep]
 
 def output_svg_lines(lines, output_path, width, height):
     """输出SVG线段"""
@@ -139,14 +100,12 @@ def output_svg_lines(lines, output_path, width, height):
   <g id="lines" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, (x1, y1, x2, y2) in enumerate(lines):
-        svg_content += f'    <line id="l{i}" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        f.writelines(f'    <line id="l{i}" x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}"/>\n'
+                     for i, (x1, y1, x2, y2) in enumerate(lines))
+        f.write('''  </g>
+</svg>''')
 
 def output_ai_lines(lines, output_path, width, height):
     """输出AI线段"""
@@ -168,18 +127,16 @@ def output_ai_lines(lines, output_path, width, height):
 
 '''
     
-    for i, (x1, y1, x2, y2) in enumerate(lines):
-        ai_content += f"\n% Line {i + 1}\n"
-        ai_content += "newpath\n"
-        ai_content += f"{x1} {height - y1} moveto\n"
-        ai_content += f"{x2} {height - y2} lineto\n"
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(ai_content)
+        f.writelines(f"\n% Line {i + 1}\n"
+                     "newpath\n"
+                     f"{x1} {height - y1} moveto\n"
+                     f"{x2} {height - y2} lineto\n"
+                     "stroke\n"
+                     for i, (x1, y1, x2, y2) in enumerate(lines))
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
 def output_svg_contours(contours, output_path, width, height):
     """输出SVG轮廓"""
@@ -198,23 +155,11 @@ def output_svg_contours(contours, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, contour in enumerate(contours):
-        if len(contour) < 2:
-            continue
-        
-        points = contour.reshape(-1, 2)
-        
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        f.writelines(svg_path_elements(contours))
+        f.write('''  </g>
+</svg>''')
     
     return total_points
 
@@ -238,27 +183,11 @@ def output_ai_contours(contours, output_path, width, height):
 
 '''
     
-    for i, contour in enumerate(contours):
-        if len(contour) < 2:
-            continue
-        
-        points = contour.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-        
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
-        
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(ai_content)
+        f.writelines(ai_path_blocks(contours, height))
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
 def process_for_printing(pdf_path="a.pdf"):
     """处理PDF线条用于印刷"""
@@ -267,13 +196,9 @@ def process_for_printing(pdf_path="a.pdf"):
     print("=" * 60)
     
     print("\n[1/4] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/4] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    图片尺寸: {width}x{height}")
@@ -1,34 +1,20 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from _render_cache import get_page_array, blur_gray
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=200):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
+LINE_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (17, 17))
+LINE_OPEN_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
 
-def get_smooth_lines(img):
+def get_smooth_lines(img, blurred=None):
     """获取平滑的线条区域"""
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = img.copy()
-    
-    blurred = cv2.GaussianBlur(gray, (7, 7), 2)
+    if blurred is None:
+        blurred = blur_gray(img)
     
     _, binary = cv2.threshold(blurred, 50, 255, cv2.THRESH_BINARY_INV)
     
-    kernel = np.ones((5, 5), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=4)
-    
-    kernel2 = np.ones((3, 3), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel2, iterations=2)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, LINE_CLOSE_KERNEL)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, LINE_OPEN_KERNEL)
     
     return binary
 
@@ -46,31 +32,18 @@ def get_smooth_contours(binary):
         epsilon = 0.01 * cv2.arcLength(contour, True)
         approx = cv2.approxPolyDP(contour, epsilon, True)
         
-        smoothed_contours.append(approx)
+        smoothed_contours.append(smooth_contour_polygon(approx))
     
     return smoothed_contours
 
 def smooth_contour_polygon(contour, iterations=2):
     """多边形平滑"""
+    pts = contour.reshape(-1, 2)
+    
     for _ in range(iterations):
-        new_contour = []
-        n = len(contour)
-        for i in range(n):
-            prev_idx = (i - 1) % n
-            next_idx = (i + 1) % n
-            
-            prev_pt = contour[prev_idx][0]
-            curr_pt = contour[i][0]
-            next_pt = contour[next_idx][0]
-            
-            avg_x = (prev_pt[0] + curr_pt[0] + next_pt[0]) // 3
-            avg_y = (prev_pt[1] + curr_pt[1] + next_pt[1]) // 3
-            
-            new_contour.append([[avg_x, avg_y]])
-        
-        contour = np.array(new_contour)
+        pts = (np.roll(pts, 1, axis=0) + pts + np.roll(pts, -1, axis=0)) // 3
     
-    return contour
+    return pts.reshape(-1, 1, 2)
 
 def fill_contour_svg(contour, width, height, line_width=3):
     """填充轮廓为实心线条"""
@@ -98,24 +71,20 @@ def contours_to_svg(contours, output_path, width, height, line_width=3):
   <g id="lines" stroke="black" fill="none" stroke-width="{line_width}" stroke-linejoin="round" stroke-linecap="round">
 '''
     
-    for i, contour in enumerate(contours):
-        contour = smooth_contour_polygon(contour)
-        points = contour.reshape(-1, 2)
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(svg_content)
         
-        if len(points) < 3:
-            continue
+        for i, contour in enumerate(contours):
+            points = contour.reshape(-1, 2)
+            
+            if len(points) < 3:
+                continue
+            
+            body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+            f.write(f'    <path id="s{i}" d="M {points[0, 0]} {points[0, 1]} {body}Z"/>\n')
         
-        svg_content += f'    <path id="s{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += f'Z"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
+        f.write('''  </g>
+</svg>''')
 
 def contours_to_ai(contours, output_path, width, height, line_width=3):
     """将轮廓转换为AI格式"""
@@ -141,31 +110,27 @@ def contours_to_ai(contours, output_path, width, height, line_width=3):
 '''
     height = int(height)
     
-    for i, contour in enumerate(contours):
-        contour = smooth_contour_polygon(contour)
-        points = contour.reshape(-1, 2)
-        
-        if len(points) < 3:
-            continue
-        
-        ai_content += f"\n% Shape {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
+        f.write(ai_content)
         
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
+        for i, contour in enumerate(contours):
+            if len(contour) < 3:
+                continue
+            
+            flipped = contour.reshape(-1, 2).copy()
+            flipped[:, 1] = height - flipped[:, 1]
+            
+            body = ("%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist())
+            f.write(f"\n% Shape {i + 1} ({len(flipped)} points)\n"
+                    "newpath\n"
+                    f"{flipped[0, 0]} {flipped[0, 1]} moveto\n"
+                    f"{body}closepath\n"
+                    "stroke\n")
         
-        ai_content += "closepath\n"
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
 
-def process_solid_lines(pdf_path="a.pdf", line_width=4):
+def process_solid_lines(pdf_path="a.pdf", line_width=4, img=None, blurred=None):
     """处理实心平滑线条"""
     print("=" * 60)
     print("PDF 实心平滑线条处理")
@@ -173,19 +138,16 @@ def process_solid_lines(pdf_path="a.pdf", line_width=4):
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=200)
+    if img is None:
+        img = get_page_array(pdf_path, dpi=200)
     
     print("\n[2/5] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
     
     print("\n[3/5] 提取平滑线条区域...")
-    binary = get_smooth_lines(img)
+    binary = get_smooth_lines(img, blurred)
     
     print("\n[4/5] 获取平滑轮廓...")
     contours = get_smooth_contours(binary)
@@ -0,0 +1,9 @@
+import numpy as np
+
+from continuous_no_gap import extract_endpoints
+
+def test_endpoint_on_image_border():
+    skeleton = np.zeros((10, 10), np.uint8)
+    skeleton[1, 0:5] = 255
+    
+    assert sorted(map(tuple, extract_endpoints(skeleton).tolist())) == [(0, 1), (4, 1)]
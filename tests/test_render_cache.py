@@ -0,0 +1,52 @@
+import os
+
+import cv2
+import fitz
+import numpy as np
+
+import _render_cache
+
+def _make_pdf(path):
+    doc = fitz.open()
+    page = doc.new_page(width=72, height=72)
+    page.draw_line((10, 10), (60, 60))
+    doc.save(path)
+    doc.close()
+
+def test_new_version_prunes_stale_entries(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(_render_cache, "CACHE_DIR", str(cache_dir))
+    pdf_path = str(tmp_path / "a.pdf")
+    _make_pdf(pdf_path)
+    os.utime(pdf_path, ns=(1_000_000_000, 1_000_000_000))
+    
+    _render_cache.get_page_array(pdf_path, dpi=72)
+    _render_cache.get_page_array(pdf_path, dpi=144)
+    assert len(os.listdir(cache_dir)) == 2
+    
+    os.utime(pdf_path, ns=(2_000_000_000, 2_000_000_000))
+    img = _render_cache.get_page_array(pdf_path, dpi=72)
+    
+    assert img.shape == (72, 72, 3)
+    names = os.listdir(cache_dir)
+    assert len(names) == 1
+    assert "-2000000000-" in names[0]
+
+def test_other_pdf_entries_are_kept(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(_render_cache, "CACHE_DIR", str(cache_dir))
+    first, second = str(tmp_path / "a.pdf"), str(tmp_path / "b.pdf")
+    _make_pdf(first)
+    _make_pdf(second)
+    
+    _render_cache.get_page_array(first, dpi=72)
+    _render_cache.get_page_array(second, dpi=72)
+    
+    assert len(os.listdir(cache_dir)) == 2
+
+def test_blur_gray_kernel_parameters():
+    img = np.random.default_rng(0).integers(0, 256, (40, 40, 3), dtype=np.uint8)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    
+    assert (_render_cache.blur_gray(img) == cv2.GaussianBlur(gray, (7, 7), 2)).all()
+    assert (_render_cache.blur_gray(img, ksize=3, sigma=0) == cv2.GaussianBlur(gray, (3, 3), 0)).all()
@@ -0,0 +1,64 @@
+import cv2
+import numpy as np
+
+from _trace import trace_skeleton_paths
+
+def _covered(paths, shape):
+    covered = np.zeros(shape, dtype=bool)
+    for path in paths:
+        covered[path[:, 1], path[:, 0]] = True
+    return covered
+
+def _max_step(path):
+    if len(path) < 2:
+        return 0
+    return int(np.abs(np.diff(path, axis=0)).max())
+
+def test_plus_keeps_center_pixel():
+    skeleton = np.zeros((200, 200), np.uint8)
+    skeleton[100, 20:181] = 255
+    skeleton[20:181, 100] = 255
+    
+    paths = trace_skeleton_paths(skeleton)
+    
+    assert sum(len(path) for path in paths) == 321
+    assert _covered(paths, skeleton.shape).sum() == 321
+    assert all(_max_step(path) <= 1 for path in paths)
+
+def test_theta_has_no_single_point_runs():
+    skeleton = np.zeros((200, 200), np.uint8)
+    cv2.circle(skeleton, (100, 100), 60, 255, 1)
+    skeleton[100, 41:160] = 255
+    
+    paths = trace_skeleton_paths(skeleton)
+    
+    assert all(len(path) > 1 for path in paths)
+    assert all(_max_step(path) <= 1 for path in paths)
+    assert (_covered(paths, skeleton.shape) == (skeleton > 0)).all()
+
+def test_line_is_one_ordered_path():
+    skeleton = np.zeros((50, 50), np.uint8)
+    skeleton[25, 5:45] = 255
+    
+    paths = trace_skeleton_paths(skeleton)
+    
+    assert len(paths) == 1
+    xs = paths[0][:, 0]
+    assert (np.abs(np.diff(xs)) == 1).all()
+    assert sorted(xs.tolist()) == list(range(5, 45))
+
+def test_filled_blob_stays_one_run():
+    mask = np.zeros((100, 100), np.uint8)
+    cv2.circle(mask, (50, 50), 20, 255, -1)
+    
+    paths = trace_skeleton_paths(mask)
+    
+    assert len(paths) == 1
+    assert _max_step(paths[0]) <= 1
+
+def test_min_length_filters_short_paths():
+    skeleton = np.zeros((50, 50), np.uint8)
+    skeleton[10, 5:10] = 255
+    skeleton[30, 5:30] = 255
+    
+    assert [len(path) for path in trace_skeleton_paths(skeleton, min_length=6)] == [25]
@@ -1,30 +1,13 @@
-import fitz
 import cv2
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+from _render_cache import get_page_array, blur_gray
 
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=300):
-    """将PDF页面提取为高分辨率图片"""
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    
-    doc.close()
-    return output_path
-
-def detect_black_lines(img):
+def detect_black_lines(img, blurred=None):
     """检测黑色线条边框"""
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = img.copy()
-    
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+    if blurred is None:
+        blurred = blur_gray(img, ksize=3, sigma=0)
     
     _, binary = cv2.threshold(blurred, 50, 255, cv2.THRESH_BINARY_INV)
     
@@ -45,33 +28,27 @@ def contours_to_svg(points, height, contour_id):
     if len(points) == 2:
         return f'    <line id="l{contour_id}" x1="{points[0][0]}" y1="{points[0][1]}" x2="{points[1][0]}" y2="{points[1][1]}"/>\n'
     
-    svg = f'    <path id="p{contour_id}" d="'
-    svg += f"M {points[0][0]} {points[0][1]} "
-    for j in range(1, len(points)):
-        svg += f"L {points[j][0]} {points[j][1]} "
-    svg += '"/>\n'
-    return svg
+    body = ("L %d %d " * (len(points) - 1)) % tuple(points[1:].ravel().tolist())
+    return f'    <path id="p{contour_id}" d="M {points[0, 0]} {points[0, 1]} {body}"/>\n'
 
 def contours_to_ai(points, height, contour_id, area):
     """将轮廓转换为AI路径"""
     if len(points) < 2:
         return ""
     
-    ai = f"\n% Contour {contour_id} ({len(points)} points, area: {area:.1f})\n"
-    ai += "newpath\n"
-    ai += f"{points[0][0]} {height - points[0][1]} moveto\n"
-    
-    for j in range(1, len(points)):
-        x, y = points[j]
-        ai += f"{x} {height - y} lineto\n"
+    flipped = points.copy()
+    flipped[:, 1] = height - flipped[:, 1]
     
-    ai += "closepath\n"
-    ai += "stroke\n"
-    return ai
+    body = ("%d %d lineto\n" * (len(flipped) - 1)) % tuple(flipped[1:].ravel().tolist())
+    return (f"\n% Contour {contour_id} ({len(flipped)} points, area: {area:.1f})\n"
+            "newpath\n"
+            f"{flipped[0, 0]} {flipped[0, 1]} moveto\n"
+            f"{body}closepath\n"
+            "stroke\n")
 
-def trace_lines(img, output_prefix, width, height):
+def trace_lines(img, output_prefix, width, height, blurred=None):
     """描摹所有线条"""
-    edges = detect_black_lines(img)
+    edges = detect_black_lines(img, blurred)
     
     contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
     sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)
@@ -110,52 +87,62 @@ def trace_lines(img, output_prefix, width, height):
 
 '''
     
-    for i, contour in enumerate(sorted_contours):
-        area = cv2.contourArea(contour)
-        if area < 5:
-            continue
-        
-        points = contour.reshape(-1, 2)
-        if len(points) < 2:
-            continue
-        
-        svg_content += contours_to_svg(points, height, i)
-        ai_content += contours_to_ai(points, height, i, area)
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
     svg_path = f"{output_prefix}.svg"
     ai_path = f"{output_prefix}.ai"
     
-    with open(svg_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
-    
-    with open(ai_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+    with open(svg_path, "w", encoding="utf-8", buffering=1 << 20) as svg_f, \
+         open(ai_path, "w", encoding="utf-8", buffering=1 << 20) as ai_f:
+        svg_f.write(svg_content)
+        ai_f.write(ai_content)
+        
+        for i, contour in enumerate(sorted_contours):
+            area = cv2.contourArea(contour)
+            if area < 5:
+                continue
+            
+            points = contour.reshape(-1, 2)
+            if len(points) < 2:
+                continue
+            
+            svg_f.write(contours_to_svg(points, height, i))
+            ai_f.write(contours_to_ai(points, height, i, area))
+        
+        svg_f.write('''  </g>
+</svg>''')
+        
+        ai_f.write("\nshowpage\n")
+        ai_f.write("%%EndDocument\n")
     
     print(f"    生成: {svg_path}, {ai_path}")
     
     return total_contours
 
-def trace_with_hierarchical_lines(img, output_prefix, width, height):
-    """分层描摹线条（按粗细分层）"""
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = img.copy()
+def _layer_contours(image, threshold_low, threshold_high, scale=1):
+    """单层阈值的边缘检测与轮廓提取，坐标乘以 scale 还原到原图，按面积从大到小排序"""
+    edges = cv2.Canny(image, threshold_low, threshold_high)
     
-    blurred = cv2.GaussianBlur(gray, (3, 3), 0)
+    kernel = np.ones((2, 2), np.uint8)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
+    
+    contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    if scale != 1:
+        contours = [c * scale for c in contours]
+    
+    return sorted(contours, key=cv2.contourArea, reverse=True)
+
+def trace_with_hierarchical_lines(img, output_prefix, width, height, blurred=None):
+    """分层描摹线条（按粗细分层）"""
+    if blurred is None:
+        blurred = blur_gray(img, ksize=3, sigma=0)
     
     edge_configs = [
-        (10, 30, "fine"),
-        (30, 80, "medium"),
-        (80, 150, "thick"),
+        (10, 30, "fine", 1),
+        (30, 80, "medium", 2),
+        (80, 150, "thick", 2),
     ]
     
+    images = {1: blurred, 2: cv2.pyrDown(blurred)}
+    
     svg_content = f'''<?xml version="1.0" encoding="UTF-8"?>
 <svg xmlns="http://www.w3.org/2000/svg"
      width="{width}" height="{height}" viewBox="0 0 {width} {height}">
@@ -189,51 +176,44 @@ def trace_with_hierarchical_lines(img, output_prefix, width, height):
     
     total_count = 0
     
-    for threshold_low, threshold_high, style_name in edge_configs:
-        edges = cv2.Canny(blurred, threshold_low, threshold_high)
-        
-        kernel = np.ones((2, 2), np.uint8)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel)
-        
-        contours, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
-        
-        sorted_contours = sorted(contours, key=cv2.contourArea, reverse=True)
-        
-        svg_content += f'\n  <!-- {style_name} lines -->\n'
-        svg_content += f'  <g id="{style_name}" class="{style_name}">\n'
-        
-        ai_content += f"\n% {style_name} lines ({len(sorted_contours)} contours)\n"
+    with ThreadPoolExecutor(max_workers=len(edge_configs)) as ex:
+        layers = list(ex.map(lambda c: _layer_contours(images[c[3]], c[0], c[1], c[3]), edge_configs))
+    
+    svg_path = f"{output_prefix}_hierarchical.svg"
+    ai_path = f"{output_prefix}_hierarchical.ai"
+    
+    with open(svg_path, "w", encoding="utf-8", buffering=1 << 20) as svg_f, \
+         open(ai_path, "w", encoding="utf-8", buffering=1 << 20) as ai_f:
+        svg_f.write(svg_content)
+        ai_f.write(ai_content)
         
-        for i, contour in enumerate(sorted_contours):
-            area = cv2.contourArea(contour)
-            if area < 3:
-                continue
+        for (_, _, style_name, _), sorted_contours in zip(edge_configs, layers):
+            svg_f.write(f'\n  <!-- {style_name} lines -->\n'
+                        f'  <g id="{style_name}" class="{style_name}">\n')
             
-            points = contour.reshape(-1, 2)
-            if len(points) < 2:
-                continue
-            
-            total_count += 1
+            ai_f.write(f"\n% {style_name} lines ({len(sorted_contours)} contours)\n")
             
-            svg_content += contours_to_svg(points, height, f"{style_name}_{i}")
+            for i, contour in enumerate(sorted_contours):
+                area = cv2.contourArea(contour)
+                if area < 3:
+                    continue
+                
+                points = contour.reshape(-1, 2)
+                if len(points) < 2:
+                    continue
+                
+                total_count += 1
+                
+                svg_f.write(contours_to_svg(points, height, f"{style_name}_{i}"))
+                
+                ai_f.write(contours_to_ai(points, height, total_count, area))
             
-            ai_content += contours_to_ai(points, height, total_count, area)
+            svg_f.write('  </g>\n')
         
-        svg_content += '  </g>\n'
-    
-    svg_content += '</svg>'
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    svg_path = f"{output_prefix}_hierarchical.svg"
-    ai_path = f"{output_prefix}_hierarchical.ai"
-    
-    with open(svg_path, "w", encoding="utf-8") as f:
-        f.write(svg_content)
-    
-    with open(ai_path, "w", encoding="utf-8") as f:
-        f.write(ai_content)
+        svg_f.write('</svg>')
+        
+        ai_f.write("\nshowpage\n")
+        ai_f.write("%%EndDocument\n")
     
     print(f"    生成: {svg_path}, {ai_path}")
     
@@ -246,24 +226,24 @@ def process_pdf_lines(pdf_path="a.pdf"):
     print("=" * 60)
     
     print("\n[1/3] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=300)
+    img = get_page_array(pdf_path, dpi=300)
     
     print("\n[2/3] 读取并处理...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    图片尺寸: {width}x{height}")
     
     base_name = "extracted/lines"
-    
-    print("\n    描摹所有线条...")
-    trace_lines(img, base_name, width, height)
-    
-    print("\n    生成分层线条...")
-    trace_with_hierarchical_lines(img, base_name, width, height)
+    blurred = blur_gray(img, ksize=3, sigma=0)
+    
+    print("\n    描摹所有线条并生成分层线条...")
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        futures = [
+            ex.submit(trace_lines, img, base_name, width, height, blurred),
+            ex.submit(trace_with_hierarchical_lines, img, base_name, width, height, blurred),
+        ]
+        for future in futures:
+            future.result()
     
     print("\n[3/3] 完成！")
     print("=" * 60)
@@ -1,39 +1,30 @@
-import fitz
 import cv2
 import numpy as np
 import os
-
-def extract_page_as_image(pdf_path, output_path="extracted/page.png", dpi=200):
-    doc = fitz.open(pdf_path)
-    page = doc[0]
-    zoom = dpi / 72
-    mat = fitz.Matrix(zoom, zoom)
-    pixmap = page.get_pixmap(matrix=mat)
-    pixmap.save(output_path)
-    doc.close()
-    return output_path
-
-def get_smooth_lines(img):
+from concurrent.futures import ThreadPoolExecutor
+from scipy.signal import savgol_filter
+from _render_cache import get_page_array, blur_gray
+from _vector_io import svg_path_elements, ai_path_blocks
+from _trace import trace_skeleton_paths
+
+LINE_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (26, 26))
+LINE_OPEN_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (10, 10))
+EDGE_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (13, 13))
+SKELETON_CLOSE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))
+
+def get_smooth_lines(img, blurred=None):
     """获取平滑线条"""
-    if len(img.shape) == 3:
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = img.copy()
-    
-    blurred = cv2.GaussianBlur(gray, (7, 7), 2)
+    if blurred is None:
+        blurred = blur_gray(img)
     
     _, binary = cv2.threshold(blurred, 50, 255, cv2.THRESH_BINARY_INV)
     
-    kernel = np.ones((6, 6), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel, iterations=5)
-    
-    kernel2 = np.ones((4, 4), np.uint8)
-    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel2, iterations=3)
+    binary = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, LINE_CLOSE_KERNEL, anchor=(15, 15))
+    binary = cv2.morphologyEx(binary, cv2.MORPH_OPEN, LINE_OPEN_KERNEL, anchor=(6, 6))
     
     edges = cv2.Canny(binary, 30, 100)
     
-    kernel3 = np.ones((5, 5), np.uint8)
-    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, kernel3, iterations=3)
+    edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, EDGE_CLOSE_KERNEL)
     
     return edges
 
@@ -43,103 +34,41 @@ def get_thin_centerline(edges):
     _, skeleton = cv2.threshold(dist, 0.5, 255, cv2.THRESH_BINARY)
     skeleton = np.uint8(skeleton)
     
-    kernel = np.ones((3, 3), np.uint8)
-    skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, kernel, iterations=2)
+    skeleton = cv2.morphologyEx(skeleton, cv2.MORPH_CLOSE, SKELETON_CLOSE_KERNEL)
     
     return skeleton
 
 def extract_paths(skeleton, min_length=80):
     """提取路径"""
-    visited = np.zeros(skeleton.shape, np.uint8)
-    height, width = skeleton.shape
-    
-    paths = []
-    
-    for y in range(height):
-        for x in range(width):
-            if skeleton[y, x] == 0 or visited[y, x]:
-                continue
-            
-            points = []
-            stack = [(x, y)]
-            visited[y, x] = 255
-            
-            while stack:
-                cx, cy = stack.pop()
-                points.append((cx, cy))
-                
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        if dx == 0 and dy == 0:
-                            continue
-                        nx, ny = cx + dx, cy + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if skeleton[ny, nx] > 0 and visited[ny, nx] == 0:
-                                visited[ny, nx] = 255
-                                stack.append((nx, ny))
-            
-            if len(points) >= min_length:
-                paths.append(np.array(points))
-    
-    return paths
+    return trace_skeleton_paths(skeleton, min_length)
 
 def savitzky_golay_smooth(points, window=11, order=3):
     """Savitzky-Golay 平滑"""
     if len(points) < window:
         return points
     
-    points = np.array(points)
-    
-    half = window // 2
-    
-    smoothed = []
-    for i in range(len(points)):
-        start = max(0, i - half)
-        end = min(len(points), i + half + 1)
-        
-        window_pts = points[start:end]
-        
-        x = np.arange(len(window_pts))
-        try:
-            z = np.polyfit(x, window_pts[:, 0], order)
-            p = np.poly1d(z)
-            x_new = i - start
-            smoothed_x = int(p(x_new))
-        except:
-            smoothed_x = points[i][0]
-        
-        try:
-            z = np.polyfit(x, window_pts[:, 1], order)
-            p = np.poly1d(z)
-            x_new = i - start
-            smoothed_y = int(p(x_new))
-        except:
-            smoothed_y = points[i][1]
-        
-        smoothed.append((smoothed_x, smoothed_y))
+    pts = np.asarray(points, dtype=np.float64)
     
-    return np.array(smoothed)
+    return savgol_filter(pts, window, order, axis=0, mode='interp').astype(int)
 
 def moving_average_smooth(points, window=9):
     """移动平均平滑"""
     if len(points) < window:
         return points
     
-    smoothed = []
+    pts = np.asarray(points, dtype=np.float64)
+    n = len(pts)
     half = window // 2
     
-    for i in range(len(points)):
-        start = max(0, i - half)
-        end = min(len(points), i + half + 1)
-        
-        window_pts = points[start:end]
-        
-        avg_x = int(np.mean([p[0] for p in window_pts]))
-        avg_y = int(np.mean([p[1] for p in window_pts]))
-        
-        smoothed.append((avg_x, avg_y))
+    cs = np.cumsum(np.pad(pts, ((1, 0), (0, 0))), axis=0)
+    idx = np.arange(n)
+    starts = np.clip(idx - half, 0, n)
+    ends = np.clip(idx + half + 1, 0, n)
     
-    return np.array(smoothed)
+    sums = cs[ends] - cs[starts]
+    counts = (ends - starts)[:, None]
+    
+    return (sums / counts).astype(int)
 
 def curve_fitting_smooth(points, n_points=None):
     """曲线拟合"""
@@ -152,18 +81,11 @@ def curve_fitting_smooth(points, n_points=None):
     t = np.linspace(0, 1, len(points))
     t_new = np.linspace(0, 1, n_points)
     
-    x = points[:, 0].astype(float)
-    y = points[:, 1].astype(float)
-    
     try:
-        from scipy.interpolate import interp1d
-        fx = interp1d(t, x, kind='cubic')
-        fy = interp1d(t, y, kind='cubic')
-        
-        x_new = fx(t_new)
-        y_new = fy(t_new)
+        from scipy.interpolate import CubicSpline
+        cs = CubicSpline(t, points.astype(float), axis=0)
         
-        return np.column_stack([x_new.astype(int), y_new.astype(int)])
+        return cs(t_new).astype(int)
     except:
         return points
 
@@ -172,35 +94,63 @@ def simplify_path(points, tolerance=10):
     if len(points) < 3:
         return points
     
-    simplified = [points[0]]
-    for i in range(1, len(points)):
-        dist = np.sqrt((points[i][0] - simplified[-1][0])**2 + 
-                       (points[i][1] - simplified[-1][1])**2)
-        if dist >= tolerance:
-            simplified.append(points[i])
+    pts = np.asarray(points)
+    seg = np.hypot(np.diff(pts[:, 0]), np.diff(pts[:, 1]))
+    cum = np.concatenate(([0.0], np.cumsum(seg)))
+    
+    keep = [0]
+    while True:
+        i = int(np.searchsorted(cum, cum[keep[-1]] + tolerance))
+        if i >= len(cum):
+            break
+        keep.append(max(i, keep[-1] + 1))
+    
+    return pts[keep]
+
+def _smooth_one(path):
+    """单条路径的多重平滑与简化，过短时返回 None"""
+    if len(path) < 15:
+        return None
+    
+    step1 = moving_average_smooth(path, window=9)
+    if len(step1) < 10:
+        return None
+    
+    step2 = savitzky_golay_smooth(step1, window=7, order=2)
+    if len(step2) < 8:
+        return None
     
-    return np.array(simplified)
+    try:
+        step3 = curve_fitting_smooth(step2)
+    except:
+        step3 = step2
+    
+    if len(step3) < 6:
+        return None
+    
+    final = simplify_path(step3, tolerance=8)
+    if len(final) > 5:
+        return final
+    
+    return None
 
-def process_smooth(pdf_path="a.pdf"):
+def process_smooth(pdf_path="a.pdf", img=None, blurred=None):
     """处理平滑线条"""
     print("=" * 60)
     print("PDF 平滑线条处理 (多重平滑)")
     print("=" * 60)
     
     print("\n[1/5] 提取PDF页面...")
-    image_path = extract_page_as_image(pdf_path, dpi=200)
+    if img is None:
+        img = get_page_array(pdf_path, dpi=200)
     
     print("\n[2/5] 读取图片...")
-    img = cv2.imread(image_path)
-    if img is None:
-        print("无法读取图片")
-        return
     
     height, width = img.shape[:2]
     print(f"    尺寸: {width}x{height}")
     
     print("\n[3/5] 提取平滑线条...")
-    edges = get_smooth_lines(img)
+    edges = get_smooth_lines(img, blurred)
     
     skeleton = get_thin_centerline(edges)
     
@@ -208,30 +158,8 @@ def process_smooth(pdf_path="a.pdf"):
     print(f"    原始路径: {len(paths)} 条")
     
     print("\n[4/5] 多重平滑处理...")
-    smoothed_paths = []
-    for path in paths:
-        if len(path) < 15:
-            continue
-        
-        step1 = moving_average_smooth(path, window=9)
-        if len(step1) < 10:
-            continue
-        
-        step2 = savitzky_golay_smooth(step1, window=7, order=2)
-        if len(step2) < 8:
-            continue
-        
-        try:
-            step3 = curve_fitting_smooth(step2)
-        except:
-            step3 = step2
-        
-        if len(step3) < 6:
-            continue
-        
-        final = simplify_path(step3, tolerance=8)
-        if len(final) > 5:
-            smoothed_paths.append(final)
+    with ThreadPoolExecutor() as ex:
+        smoothed_paths = [p for p in ex.map(_smooth_one, paths) if p is not None]
     
     print(f"    平滑后: {len(smoothed_paths)} 条")
     
@@ -273,23 +201,11 @@ def output_svg(paths, output_path, width, height):
   <g id="paths" stroke="black" fill="none" stroke-width="0.5">
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        svg_content += f'    <path id="p{i}" d="'
-        svg_content += f"M {points[0][0]} {points[0][1]} "
-        for j in range(1, len(points)):
-            svg_content += f"L {points[j][0]} {points[j][1]} "
-        svg_content += '"/>\n'
-    
-    svg_content += '''  </g>
-</svg>'''
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(svg_content)
+        f.writelines(svg_path_elements(paths))
+        f.write('''  </g>
+</svg>''')
     
     print(f"    SVG: {len(paths)} 条, {total_points} 点")
 
@@ -313,27 +229,11 @@ def output_ai(paths, output_path, width, height):
 
 '''
     
-    for i, path in enumerate(paths):
-        if len(path) < 2:
-            continue
-        
-        points = path.reshape(-1, 2)
-        
-        ai_content += f"\n% Path {i + 1} ({len(points)} points)\n"
-        ai_content += "newpath\n"
-        ai_content += f"{points[0][0]} {height - points[0][1]} moveto\n"
-        
-        for j in range(1, len(points)):
-            x, y = points[j]
-            ai_content += f"{x} {height - y} lineto\n"
-        
-        ai_content += "stroke\n"
-    
-    ai_content += "\nshowpage\n"
-    ai_content += "%%EndDocument\n"
-    
-    with open(output_path, "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8", buffering=1 << 20) as f:
         f.write(ai_content)
+        f.writelines(ai_path_blocks(paths, height))
+        f.write("\nshowpage\n")
+        f.write("%%EndDocument\n")
     
     print(f"    AI: {len(paths)} 条")
 